@@ -21,8 +21,10 @@ ports = [hl2ss.StreamPort.RM_VLC_LEFTFRONT,
          hl2ss.StreamPort.RM_IMU_ACCELEROMETER,
          hl2ss.StreamPort.RM_IMU_GYROSCOPE]
 
+print('Fetching RM calibrations')
+_, elapsed = hl2ss_3dcv.get_calibration_rm_many(host, ports, path)
+
 for port in ports:
-    print('Fetching calibration for ' + hl2ss.get_port_name(port))
-    hl2ss_3dcv.get_calibration_rm(host, port, path)
+    print(hl2ss.get_port_name(port) + ': ' + (f'downloaded in {elapsed[port]:.3f} s' if (port in elapsed) else 'loaded from ' + path))
 
 print('RM calibrations saved to ' + path)
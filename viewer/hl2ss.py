@@ -2,6 +2,8 @@
 import numpy as np
 import socket
 import struct
+import threading
+import queue
 import cv2
 import av
 
@@ -57,6 +59,19 @@ class StreamMode:
     MODE_2 = 2
 
 
+# Packet Gatherer Mode
+# 0: Packets own their data (payload and pose are copied out of the receive buffer)
+# 1: Packets reference a preallocated ring buffer filled with recv_into (no copies)
+#    Payload and pose are only valid until the next packet is requested
+# 2: Packets reference a preallocated grow-only buffer filled with recv_into
+#    (header first, then payload and pose directly into the buffer, no copies)
+#    Payload and pose are only valid until the next packet is requested
+class GathererMode:
+    COPY   = 0
+    RING   = 1
+    DIRECT = 2
+
+
 # Video Encoder Profile
 #   0: H264 base
 #   1: H264 main
@@ -265,10 +280,19 @@ class _RANGEOF:
 
 
 class _client:
-    def open(self, host, port):
+    def create(self, sockopt):
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if (sockopt is not None):
+            for (level, name), value in sockopt.items():
+                self._socket.setsockopt(level, name, value)
+
+    def connect(self, host, port):
         self._socket.connect((host, port))
 
+    def open(self, host, port):
+        self.create(dict())
+        self.connect(host, port)
+
     def sendall(self, data):
         self._socket.sendall(data)
 
@@ -278,18 +302,34 @@ class _client:
             raise Exception('connection closed')
         return chunk
 
+    def recv_into(self, buffer):
+        size = self._socket.recv_into(buffer)
+        if (size <= 0):
+            raise Exception('connection closed')
+        return size
+
+    def download_into(self, buffer, chunk_size):
+        view = memoryview(buffer)
+        while (len(view) > 0):
+            view = view[self.recv_into(view[:chunk_size]):]
+        return buffer
+
     def download(self, total, chunk_size):
-        data = bytearray()
+        data = bytearray(total)
+        view = memoryview(data)
+        offset = 0
 
-        while (total > 0):
-            if (chunk_size > total):
-                chunk_size = total
-            chunk = self.recv(chunk_size)
-            data.extend(chunk)
-            total -= len(chunk)
+        while (offset < total):
+            offset += self.recv_into(view[offset:(offset + chunk_size)])
 
         return data
 
+    def shutdown(self):
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def close(self):
         self._socket.close()
 
@@ -368,17 +408,90 @@ class _unpacker:
         return _packet(self._timestamp, self._payload, self._pose)
 
 
+class _ring_unpacker:
+    def reset(self, mode, capacity):
+        self._mode = mode
+        self._state = 0
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._begin = 0
+        self._end = 0
+        self._timestamp = None
+        self._size = None
+        self._payload = None
+        self._pose = None
+
+    def _reserve(self, size):
+        capacity = len(self._buffer)
+        if ((self._end + size) <= capacity):
+            return
+        pending = self._end - self._begin
+        if ((pending + size) > capacity):
+            # Previous views keep the old buffer alive
+            buffer = bytearray(max(2 * capacity, pending + size))
+            buffer[:pending] = self._view[self._begin:self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        elif (pending > 0):
+            self._view[:pending] = self._view[self._begin:self._end]
+        self._begin = 0
+        self._end = pending
+
+    def get_buffer(self, chunk_size):
+        pending = self._end - self._begin
+        self._reserve(max(chunk_size, self._size - pending) if (self._state == 1) else chunk_size)
+        return self._view[self._end:]
+
+    def commit(self, size):
+        self._end += size
+
+    def unpack(self):
+        length = self._end - self._begin
+
+        while (True):
+            if (self._state == 0):
+                if (length >= 12):
+                    header = struct.unpack_from('<QI', self._buffer, self._begin)
+                    self._timestamp = header[0]
+                    self._size = 12 + header[1]
+                    if (self._mode == StreamMode.MODE_1):
+                        self._size += 64
+                    self._state = 1
+                    continue
+            elif (self._state == 1):
+                if (length >= self._size):
+                    packet_begin = self._begin
+                    packet_end = packet_begin + self._size
+                    if (self._mode == StreamMode.MODE_1):
+                        payload_end = packet_end - 64
+                        self._pose = np.frombuffer(self._buffer, dtype=np.float32, count=16, offset=payload_end).reshape((4, 4))
+                    else:
+                        payload_end = packet_end
+                    self._payload = self._view[(packet_begin + 12):payload_end]
+                    self._begin = packet_end
+                    if (self._begin == self._end):
+                        self._begin = 0
+                        self._end = 0
+                    self._state = 0
+                    return True
+            return False
+
+    def get(self):
+        return _packet(self._timestamp, self._payload, self._pose)
+
+
 #------------------------------------------------------------------------------
 # Packet Gatherer
 #------------------------------------------------------------------------------
 
 class _gatherer:
-    def open(self, host, port, chunk_size, mode):
+    def open(self, host, port, chunk_size, mode, sockopt):
         self._client = _client()
         self._unpacker = _unpacker()
         self._chunk_size = chunk_size
         self._unpacker.reset(mode)
-        self._client.open(host, port)
+        self._client.create(sockopt)
+        self._client.connect(host, port)
         
     def sendall(self, data):
         self._client.sendall(data)
@@ -389,10 +502,81 @@ class _gatherer:
             if (self._unpacker.unpack()):
                 return self._unpacker.get()
 
+    def shutdown(self):
+        self._client.shutdown()
+
     def close(self):
         self._client.close()
 
 
+class _ring_gatherer:
+    CAPACITY = 4*1024*1024
+
+    def open(self, host, port, chunk_size, mode, sockopt):
+        self._client = _client()
+        self._unpacker = _ring_unpacker()
+        self._chunk_size = chunk_size
+        self._unpacker.reset(mode, max(chunk_size, _ring_gatherer.CAPACITY))
+        self._client.create(sockopt)
+        self._client.connect(host, port)
+
+    def sendall(self, data):
+        self._client.sendall(data)
+
+    def get_next_packet(self):
+        while (not self._unpacker.unpack()):
+            self._unpacker.commit(self._client.recv_into(self._unpacker.get_buffer(self._chunk_size)))
+        return self._unpacker.get()
+
+    def shutdown(self):
+        self._client.shutdown()
+
+    def close(self):
+        self._client.close()
+
+
+class _direct_gatherer:
+    def open(self, host, port, chunk_size, mode, sockopt):
+        self._client = _client()
+        self._chunk_size = chunk_size
+        self._pose_size = 64 if (mode == StreamMode.MODE_1) else 0
+        self._header = bytearray(12)
+        self._buffer = bytearray(chunk_size)
+        self._client.create(sockopt)
+        self._client.connect(host, port)
+
+    def sendall(self, data):
+        self._client.sendall(data)
+
+    def _reserve(self, size):
+        if (size > len(self._buffer)):
+            # Previous views keep the old buffer alive
+            self._buffer = bytearray(max(2 * len(self._buffer), size))
+
+    def get_next_packet(self):
+        timestamp, size = struct.unpack('<QI', self._client.download_into(self._header, self._chunk_size))
+        self._reserve(size + self._pose_size)
+        view = memoryview(self._buffer)
+        self._client.download_into(view[:(size + self._pose_size)], self._chunk_size)
+        pose = np.frombuffer(self._buffer, dtype=np.float32, count=16, offset=size).reshape((4, 4)) if (self._pose_size > 0) else None
+        return _packet(timestamp, view[:size], pose)
+
+    def shutdown(self):
+        self._client.shutdown()
+
+    def close(self):
+        self._client.close()
+
+
+def _create_gatherer(gatherer):
+    if (gatherer == GathererMode.RING):
+        return _ring_gatherer()
+    if (gatherer == GathererMode.DIRECT):
+        return _direct_gatherer()
+    
+    return _gatherer()
+
+
 #------------------------------------------------------------------------------
 # Stream Configuration
 #------------------------------------------------------------------------------
@@ -534,64 +718,64 @@ def _create_configuration_for_pv_mode2(mode, width, height, framerate):
 # Mode 0 and Mode 1 Data Acquisition
 #------------------------------------------------------------------------------
 
-def _connect_client_rm_vlc(host, port, chunk_size, mode, divisor, profile, level, bitrate, options):
-    c = _gatherer()
-    c.open(host, port, chunk_size, mode)
+def _connect_client_rm_vlc(host, port, chunk_size, mode, divisor, profile, level, bitrate, options, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, mode, sockopt)
     c.sendall(_create_configuration_for_rm_vlc(mode, divisor, profile, level, bitrate, options))
     return c
 
 
-def _connect_client_rm_depth_ahat(host, port, chunk_size, mode, divisor, profile_z, profile_ab, level, bitrate, options):
-    c = _gatherer()
-    c.open(host, port, chunk_size, mode)
+def _connect_client_rm_depth_ahat(host, port, chunk_size, mode, divisor, profile_z, profile_ab, level, bitrate, options, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, mode, sockopt)
     c.sendall(_create_configuration_for_rm_depth_ahat(mode, divisor, profile_z, profile_ab, level, bitrate, options))
     return c
 
 
-def _connect_client_rm_depth_longthrow(host, port, chunk_size, mode, divisor, png_filter):
-    c = _gatherer()
-    c.open(host, port, chunk_size, mode)
+def _connect_client_rm_depth_longthrow(host, port, chunk_size, mode, divisor, png_filter, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, mode, sockopt)
     c.sendall(_create_configuration_for_rm_depth_longthrow(mode, divisor, png_filter))
     return c
 
 
-def _connect_client_rm_imu(host, port, chunk_size, mode):
-    c = _gatherer()
-    c.open(host, port, chunk_size, mode)
+def _connect_client_rm_imu(host, port, chunk_size, mode, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, mode, sockopt)
     c.sendall(_create_configuration_for_rm_imu(mode))
     return c
 
 
-def _connect_client_pv(host, port, chunk_size, mode, width, height, framerate, divisor, profile, level, bitrate, options):
-    c = _gatherer()
-    c.open(host, port, chunk_size, mode)
+def _connect_client_pv(host, port, chunk_size, mode, width, height, framerate, divisor, profile, level, bitrate, options, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, mode, sockopt)
     c.sendall(_create_configuration_for_pv(mode, width, height, framerate, divisor, profile, level, bitrate, options))
     return c
 
 
-def _connect_client_microphone(host, port, chunk_size, profile, level):
-    c = _gatherer()
-    c.open(host, port, chunk_size, StreamMode.MODE_0)
+def _connect_client_microphone(host, port, chunk_size, profile, level, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, StreamMode.MODE_0, sockopt)
     c.sendall(_create_configuration_for_microphone(profile, level))
     return c
 
 
-def _connect_client_si(host, port, chunk_size):
-    c = _gatherer()
-    c.open(host, port, chunk_size, StreamMode.MODE_0)
+def _connect_client_si(host, port, chunk_size, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, StreamMode.MODE_0, sockopt)
     return c
 
 
-def _connect_client_eet(host, port, chunk_size, fps):
-    c = _gatherer()
-    c.open(host, port, chunk_size, StreamMode.MODE_1)
+def _connect_client_eet(host, port, chunk_size, fps, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, StreamMode.MODE_1, sockopt)
     c.sendall(_create_configuration_for_eet(fps))
     return c
 
 
-def _connect_client_extended_audio(host, port, chunk_size, mixer_mode, loopback_gain, microphone_gain, profile, level):
-    c = _gatherer()
-    c.open(host, port, chunk_size, StreamMode.MODE_0)
+def _connect_client_extended_audio(host, port, chunk_size, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer, sockopt):
+    c = _create_gatherer(gatherer)
+    c.open(host, port, chunk_size, StreamMode.MODE_0, sockopt)
     c.sendall(_create_configuration_for_extended_audio(mixer_mode, loopback_gain, microphone_gain, profile, level))
     return c
 
@@ -635,7 +819,7 @@ class _context_manager:
 #------------------------------------------------------------------------------
 
 class rx_rm_vlc(_context_manager):
-    def __init__(self, host, port, chunk, mode, divisor, profile, level, bitrate, options):
+    def __init__(self, host, port, chunk, mode, divisor, profile, level, bitrate, options, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
@@ -645,9 +829,11 @@ class rx_rm_vlc(_context_manager):
         self.level = level
         self.bitrate = bitrate
         self.options = options
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_rm_vlc(self.host, self.port, self.chunk, self.mode, self.divisor, self.profile, self.level, self.bitrate, self.options)
+        self._client = _connect_client_rm_vlc(self.host, self.port, self.chunk, self.mode, self.divisor, self.profile, self.level, self.bitrate, self.options, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -657,7 +843,7 @@ class rx_rm_vlc(_context_manager):
 
 
 class rx_rm_depth_ahat(_context_manager):
-    def __init__(self, host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options):
+    def __init__(self, host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
@@ -668,9 +854,11 @@ class rx_rm_depth_ahat(_context_manager):
         self.level = level
         self.bitrate = bitrate
         self.options = options
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_rm_depth_ahat(self.host, self.port, self.chunk, self.mode, self.divisor, self.profile_z, self.profile_ab, self.level, self.bitrate, self.options)
+        self._client = _connect_client_rm_depth_ahat(self.host, self.port, self.chunk, self.mode, self.divisor, self.profile_z, self.profile_ab, self.level, self.bitrate, self.options, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -680,16 +868,18 @@ class rx_rm_depth_ahat(_context_manager):
 
 
 class rx_rm_depth_longthrow(_context_manager):
-    def __init__(self, host, port, chunk, mode, divisor, png_filter):
+    def __init__(self, host, port, chunk, mode, divisor, png_filter, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
         self.mode = mode
         self.divisor = divisor
         self.png_filter = png_filter
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_rm_depth_longthrow(self.host, self.port, self.chunk, self.mode, self.divisor, self.png_filter)
+        self._client = _connect_client_rm_depth_longthrow(self.host, self.port, self.chunk, self.mode, self.divisor, self.png_filter, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -699,14 +889,16 @@ class rx_rm_depth_longthrow(_context_manager):
 
 
 class rx_rm_imu(_context_manager):
-    def __init__(self, host, port, chunk, mode):
+    def __init__(self, host, port, chunk, mode, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
         self.mode = mode
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_rm_imu(self.host, self.port, self.chunk, self.mode)
+        self._client = _connect_client_rm_imu(self.host, self.port, self.chunk, self.mode, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -716,7 +908,7 @@ class rx_rm_imu(_context_manager):
 
 
 class rx_pv(_context_manager):
-    def __init__(self, host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options):
+    def __init__(self, host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
@@ -729,9 +921,11 @@ class rx_pv(_context_manager):
         self.level = level
         self.bitrate = bitrate
         self.options = options
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_pv(self.host, self.port, self.chunk, self.mode, self.width, self.height, self.framerate, self.divisor, self.profile, self.level, self.bitrate, self.options)
+        self._client = _connect_client_pv(self.host, self.port, self.chunk, self.mode, self.width, self.height, self.framerate, self.divisor, self.profile, self.level, self.bitrate, self.options, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -741,15 +935,17 @@ class rx_pv(_context_manager):
 
 
 class rx_microphone(_context_manager):
-    def __init__(self, host, port, chunk, profile, level):
+    def __init__(self, host, port, chunk, profile, level, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
         self.profile = profile
         self.level = level
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_microphone(self.host, self.port, self.chunk, self.profile, self.level)
+        self._client = _connect_client_microphone(self.host, self.port, self.chunk, self.profile, self.level, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -759,13 +955,15 @@ class rx_microphone(_context_manager):
 
 
 class rx_si(_context_manager):
-    def __init__(self, host, port, chunk):
+    def __init__(self, host, port, chunk, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_si(self.host, self.port, self.chunk)
+        self._client = _connect_client_si(self.host, self.port, self.chunk, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -775,14 +973,16 @@ class rx_si(_context_manager):
 
 
 class rx_eet(_context_manager):
-    def __init__(self, host, port, chunk, fps):
+    def __init__(self, host, port, chunk, fps, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
         self.fps = fps
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_eet(self.host, self.port, self.chunk, self.fps)
+        self._client = _connect_client_eet(self.host, self.port, self.chunk, self.fps, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -792,7 +992,7 @@ class rx_eet(_context_manager):
 
 
 class rx_extended_audio:
-    def __init__(self, host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level):
+    def __init__(self, host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer=GathererMode.COPY, sockopt=None):
         self.host = host
         self.port = port
         self.chunk = chunk
@@ -801,9 +1001,11 @@ class rx_extended_audio:
         self.microphone_gain = microphone_gain
         self.profile = profile
         self.level = level
+        self.gatherer = gatherer
+        self.sockopt = sockopt
 
     def open(self):
-        self._client = _connect_client_extended_audio(self.host, self.port, self.chunk, self.mixer_mode, self.loopback_gain, self.microphone_gain, self.profile, self.level)
+        self._client = _connect_client_extended_audio(self.host, self.port, self.chunk, self.mixer_mode, self.loopback_gain, self.microphone_gain, self.profile, self.level, self.gatherer, self.sockopt)
 
     def get_next_packet(self):
         return self._client.get_next_packet()
@@ -855,22 +1057,61 @@ def get_audio_codec_bitrate(profile):
     return None
 
 
+# Video Decoder Thread Type
+# Frame threading is not supported, it delays decoder output by up to
+# thread_count - 1 packets and decoders pair each frame with the packet it
+# was decoded from (use hl2ss_io.decode_parallel for recordings)
+class VideoDecoderThreadType:
+    SLICE = 'slice'
+
+
+# Video Decoder Skip Frame
+class VideoDecoderSkipFrame:
+    DEFAULT  = 'default'
+    NONREF   = 'noref'
+    BIDIR    = 'bidir'
+    NONINTRA = 'nointra'
+    NONKEY   = 'nokey'
+    ALL      = 'all'
+
+
+# Video Decoder Options
+# Decoder options are FFmpeg AVCodecContext options (e.g. threads,
+# thread_type, skip_frame, flags)
+def _create_video_decoder(profile, options):
+    codec = av.CodecContext.create(get_video_codec_name(profile), 'r')
+    if (options is not None):
+        if ('frame' in str(options.get('thread_type', ''))):
+            raise Exception('Frame threading is not supported by packet decoders')
+        codec.options = { str(key) : str(value) for key, value in options.items() }
+    return codec
+
+
+def _decode_video_frame(codec, payload):
+    # Every parsed packet must reach the decoder, the last frame is the one
+    # for this payload
+    frame = None
+    for packet in codec.parse(payload):
+        for frame in codec.decode(packet):
+            pass
+    return frame
+
+
 #------------------------------------------------------------------------------
 # RM VLC Decoder
 #------------------------------------------------------------------------------
 
 class _decode_rm_vlc:
-    def __init__(self, profile):
+    def __init__(self, profile, options):
         self.profile = profile
+        self.options = options
 
     def create(self):
-        self._codec = av.CodecContext.create(get_video_codec_name(self.profile), 'r')
+        self._codec = _create_video_decoder(self.profile, self.options)
 
     def decode(self, payload):
-        for packet in self._codec.parse(payload):
-            for frame in self._codec.decode(packet):
-                return frame.to_ndarray()[:Parameters_RM_VLC.HEIGHT, :Parameters_RM_VLC.WIDTH]
-        return None
+        frame = _decode_video_frame(self._codec, payload)
+        return None if (frame is None) else frame.to_ndarray()[:Parameters_RM_VLC.HEIGHT, :Parameters_RM_VLC.WIDTH]
 
 
 class _unpack_rm_vlc:
@@ -881,8 +1122,8 @@ class _unpack_rm_vlc:
         return np.frombuffer(payload, dtype=np.uint8).reshape(Parameters_RM_VLC.SHAPE)
     
 
-def decode_rm_vlc(profile):
-    return _unpack_rm_vlc() if (profile == VideoProfile.RAW) else _decode_rm_vlc(profile)
+def decode_rm_vlc(profile, options):
+    return _unpack_rm_vlc() if (profile == VideoProfile.RAW) else _decode_rm_vlc(profile, options)
 
 
 #------------------------------------------------------------------------------
@@ -924,17 +1165,16 @@ def _unpack_rm_depth_ahat_nv12_as_yuv420p(yuv):
 
 
 class _decode_rm_depth_ahat:
-    def __init__(self, profile):
+    def __init__(self, profile, options):
         self.profile = profile
+        self.options = options
    
     def create(self):
-        self._codec = av.CodecContext.create(get_video_codec_name(self.profile), 'r')
+        self._codec = _create_video_decoder(self.profile, self.options)
 
     def decode(self, payload):
-        for packet in self._codec.parse(payload):
-            for frame in self._codec.decode(packet):
-                return _unpack_rm_depth_ahat_nv12_as_yuv420p(frame.to_ndarray())
-        return None
+        frame = _decode_video_frame(self._codec, payload)
+        return None if (frame is None) else _unpack_rm_depth_ahat_nv12_as_yuv420p(frame.to_ndarray())
 
 
 class _unpack_rm_depth_ahat:
@@ -959,17 +1199,16 @@ class _decompress_zdepth:
 
 
 class _decode_ab_rm_depth_ahat:
-    def __init__(self, profile):
+    def __init__(self, profile, options):
         self.profile = profile
+        self.options = options
 
     def create(self):
-        self._codec = av.CodecContext.create(get_video_codec_name(self.profile), 'r')
+        self._codec = _create_video_decoder(self.profile, self.options)
 
     def decode(self, payload):
-        for packet in self._codec.parse(payload):
-            for frame in self._codec.decode(packet):
-                return np.square(frame.to_ndarray()[:Parameters_RM_DEPTH_AHAT.HEIGHT, :Parameters_RM_DEPTH_AHAT.WIDTH], dtype=np.uint16)
-        return None
+        frame = _decode_video_frame(self._codec, payload)
+        return None if (frame is None) else np.square(frame.to_ndarray()[:Parameters_RM_DEPTH_AHAT.HEIGHT, :Parameters_RM_DEPTH_AHAT.WIDTH], dtype=np.uint16)
 
 
 class _unpack_ab_rm_depth_ahat:
@@ -981,9 +1220,9 @@ class _unpack_ab_rm_depth_ahat:
 
 
 class _decode_rm_depth_ahat_zdepth:
-    def __init__(self, profile):
+    def __init__(self, profile, options):
         self._codec_z  = _decompress_zdepth()
-        self._codec_ab = _unpack_ab_rm_depth_ahat() if (profile == VideoProfile.RAW) else _decode_ab_rm_depth_ahat(profile)
+        self._codec_ab = _unpack_ab_rm_depth_ahat() if (profile == VideoProfile.RAW) else _decode_ab_rm_depth_ahat(profile, options)
 
     def create(self):
         self._codec_z.create()
@@ -1003,8 +1242,8 @@ class _decode_rm_depth_ahat_zdepth:
         return _RM_Depth_Frame(depth, ab)
 
 
-def decode_rm_depth_ahat(profile_z, profile_ab):
-    return (_unpack_rm_depth_ahat() if (profile_ab == VideoProfile.RAW) else _decode_rm_depth_ahat(profile_ab)) if (profile_z == DepthProfile.SAME) else _decode_rm_depth_ahat_zdepth(profile_ab)
+def decode_rm_depth_ahat(profile_z, profile_ab, options):
+    return (_unpack_rm_depth_ahat() if (profile_ab == VideoProfile.RAW) else _decode_rm_depth_ahat(profile_ab, options)) if (profile_z == DepthProfile.SAME) else _decode_rm_depth_ahat_zdepth(profile_ab, options)
 
 
 def decode_rm_depth_longthrow(payload):
@@ -1018,6 +1257,9 @@ def decode_rm_depth_longthrow(payload):
 # RM IMU Unpacker
 #------------------------------------------------------------------------------
 
+_RM_IMU_SAMPLE_DTYPE = np.dtype([('vinyl_hup_ticks', '<u8'), ('soc_ticks', '<u8'), ('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('temperature', '<f4')])
+
+
 class _RM_IMU_Frame:
     def __init__(self, vinyl_hup_ticks, soc_ticks, x, y, z, temperature):
         self.vinyl_hup_ticks = vinyl_hup_ticks
@@ -1040,6 +1282,13 @@ class unpack_rm_imu:
         data = struct.unpack('<QQffff', self._batch[(index * 32):((index + 1) * 32)])
         return _RM_IMU_Frame(data[0], data[1], data[2], data[3], data[4], data[5])
 
+    def get_array(self):
+        return np.frombuffer(self._batch, dtype=_RM_IMU_SAMPLE_DTYPE, count=self._count)
+
+
+def unpack_rm_imu_array(payloads):
+    return np.frombuffer(b''.join(payloads), dtype=_RM_IMU_SAMPLE_DTYPE)
+
 
 #------------------------------------------------------------------------------
 # PV Decoder
@@ -1077,17 +1326,16 @@ def get_video_stride(width):
 
 
 class _decode_pv:
-    def __init__(self, profile):
+    def __init__(self, profile, options):
         self.profile = profile
+        self.options = options
 
     def create(self, width, height):
-        self._codec = av.CodecContext.create(get_video_codec_name(self.profile), 'r')
+        self._codec = _create_video_decoder(self.profile, self.options)
 
     def decode(self, payload, format):
-        for packet in self._codec.parse(payload):
-            for frame in self._codec.decode(packet):
-                return frame.to_ndarray(format=format)
-        return None
+        frame = _decode_video_frame(self._codec, payload)
+        return None if (frame is None) else frame.to_ndarray(format=format)
 
 
 class _unpack_pv:
@@ -1111,8 +1359,8 @@ class _unpack_pv:
         return image if (sf is None) else cv2.cvtColor(image, sf)
 
 
-def decode_pv(profile):
-    return _unpack_pv() if (profile == VideoProfile.RAW) else _decode_pv(profile)
+def decode_pv(profile, options):
+    return _unpack_pv() if (profile == VideoProfile.RAW) else _decode_pv(profile, options)
 
 
 #------------------------------------------------------------------------------
@@ -1238,27 +1486,40 @@ class _Mode0Layout_SI:
     END_HAND_RIGHT      = BEGIN_HAND_RIGHT + SI_HandJointKind.TOTAL * _Mode0Layout_SI_Hand.BYTE_COUNT
 
 
+_SI_HAND_JOINT_DTYPE = np.dtype([('orientation', '<f4', (4,)), ('position', '<f4', (3,)), ('radius', '<f4'), ('accuracy', '<i4')])
+
+_SI_DTYPE = np.dtype([
+    ('valid',         '<u4'),
+    ('head_position', '<f4', (3,)),
+    ('head_forward',  '<f4', (3,)),
+    ('head_up',       '<f4', (3,)),
+    ('eye_origin',    '<f4', (3,)),
+    ('eye_direction', '<f4', (3,)),
+    ('hand_left',     _SI_HAND_JOINT_DTYPE, (SI_HandJointKind.TOTAL,)),
+    ('hand_right',    _SI_HAND_JOINT_DTYPE, (SI_HandJointKind.TOTAL,)),
+])
+
+
 class _SI_Hand:
-    def __init__(self, payload):
-        self._data = payload
+    def __init__(self, joints):
+        self._joints = joints
 
     def get_joint_pose(self, joint):
-        begin = joint * _Mode0Layout_SI_Hand.BYTE_COUNT
-        end = begin + _Mode0Layout_SI_Hand.BYTE_COUNT
-        data = self._data[begin:end]
-
-        orientation = np.frombuffer(data[_Mode0Layout_SI_Hand.BEGIN_ORIENTATION : _Mode0Layout_SI_Hand.END_ORIENTATION], dtype=np.float32)
-        position    = np.frombuffer(data[_Mode0Layout_SI_Hand.BEGIN_POSITION    : _Mode0Layout_SI_Hand.END_POSITION],    dtype=np.float32)
-        radius      = np.frombuffer(data[_Mode0Layout_SI_Hand.BEGIN_RADIUS      : _Mode0Layout_SI_Hand.END_RADIUS],      dtype=np.float32)
-        accuracy    = np.frombuffer(data[_Mode0Layout_SI_Hand.BEGIN_ACCURACY    : _Mode0Layout_SI_Hand.END_ACCURACY],    dtype=np.int32)
+        orientation = self._joints['orientation'][joint]
+        position    = self._joints['position'][joint]
+        radius      = self._joints['radius'][joint:(joint + 1)]
+        accuracy    = self._joints['accuracy'][joint:(joint + 1)]
 
         return _SI_HandJointPose(orientation, position, radius, accuracy)
 
+    def get_array(self):
+        return self._joints
+
 
 class unpack_si:
     def __init__(self, payload):
-        self._data = payload
-        self._valid = np.frombuffer(payload[_Mode0Layout_SI.BEGIN_VALID : _Mode0Layout_SI.END_VALID], dtype=np.uint32)
+        self._data = np.frombuffer(payload, dtype=_SI_DTYPE, count=1)
+        self._valid = self._data['valid']
 
     def is_valid_head_pose(self):
         return (self._valid & _SI_Field.HEAD) != 0
@@ -1273,41 +1534,56 @@ class unpack_si:
         return (self._valid & _SI_Field.RIGHT) != 0
 
     def get_head_pose(self):
-        position = np.frombuffer(self._data[_Mode0Layout_SI.BEGIN_HEAD_POSITION : _Mode0Layout_SI.END_HEAD_POSITION], dtype=np.float32)
-        forward  = np.frombuffer(self._data[_Mode0Layout_SI.BEGIN_HEAD_FORWARD  : _Mode0Layout_SI.END_HEAD_FORWARD],  dtype=np.float32)
-        up       = np.frombuffer(self._data[_Mode0Layout_SI.BEGIN_HEAD_UP       : _Mode0Layout_SI.END_HEAD_UP],       dtype=np.float32)
-
-        return _SI_HeadPose(position, forward, up)
+        return _SI_HeadPose(self._data['head_position'][0], self._data['head_forward'][0], self._data['head_up'][0])
 
     def get_eye_ray(self):
-        origin    = np.frombuffer(self._data[_Mode0Layout_SI.BEGIN_EYE_ORIGIN    : _Mode0Layout_SI.END_EYE_ORIGIN],    dtype=np.float32)
-        direction = np.frombuffer(self._data[_Mode0Layout_SI.BEGIN_EYE_DIRECTION : _Mode0Layout_SI.END_EYE_DIRECTION], dtype=np.float32)
-
-        return _SI_EyeRay(origin, direction)
+        return _SI_EyeRay(self._data['eye_origin'][0], self._data['eye_direction'][0])
 
     def get_hand_left(self):
-        return _SI_Hand(self._data[_Mode0Layout_SI.BEGIN_HAND_LEFT : _Mode0Layout_SI.END_HAND_LEFT])
+        return _SI_Hand(self._data['hand_left'][0])
 
     def get_hand_right(self):
-        return _SI_Hand(self._data[_Mode0Layout_SI.BEGIN_HAND_RIGHT : _Mode0Layout_SI.END_HAND_RIGHT])
+        return _SI_Hand(self._data['hand_right'][0])
+
+    def get_array(self):
+        return self._data[0]
+
+
+def unpack_si_array(payloads):
+    return np.frombuffer(b''.join([payload[:_SI_DTYPE.itemsize] for payload in payloads]), dtype=_SI_DTYPE)
 
 
 #------------------------------------------------------------------------------
 # EET Unpacker
 #------------------------------------------------------------------------------
 
+_EET_DTYPE = np.dtype([
+    ('reserved',           '<u4'),
+    ('combined_origin',    '<f4', (3,)),
+    ('combined_direction', '<f4', (3,)),
+    ('left_origin',        '<f4', (3,)),
+    ('left_direction',     '<f4', (3,)),
+    ('right_origin',       '<f4', (3,)),
+    ('right_direction',    '<f4', (3,)),
+    ('left_openness',      '<f4'),
+    ('right_openness',     '<f4'),
+    ('vergence_distance',  '<f4'),
+    ('valid',              '<u4'),
+])
+
+
 class unpack_eet:
     def __init__(self, payload):
+        self._data = np.frombuffer(payload, dtype=_EET_DTYPE, count=1)[0]
         self._reserved = payload[:4]
-        f = np.frombuffer(payload[4:-4], dtype=np.float32)
-        valid = struct.unpack('<I', payload[-4:])[0]
+        valid = int(self._data['valid'])
 
-        self.combined_ray = _SI_EyeRay(f[0:3], f[3:6])
-        self.left_ray = _SI_EyeRay(f[6:9], f[9:12])
-        self.right_ray = _SI_EyeRay(f[12:15], f[15:18])
-        self.left_openness = f[18]
-        self.right_openness = f[19]
-        self.vergence_distance = f[20]
+        self.combined_ray = _SI_EyeRay(self._data['combined_origin'], self._data['combined_direction'])
+        self.left_ray = _SI_EyeRay(self._data['left_origin'], self._data['left_direction'])
+        self.right_ray = _SI_EyeRay(self._data['right_origin'], self._data['right_direction'])
+        self.left_openness = self._data['left_openness']
+        self.right_openness = self._data['right_openness']
+        self.vergence_distance = self._data['vergence_distance']
 
         self.calibration_valid = valid & 0x01 != 0
         self.combined_ray_valid = valid & 0x02 != 0
@@ -1317,122 +1593,257 @@ class unpack_eet:
         self.right_openness_valid = valid & 0x20 != 0
         self.vergence_distance_valid = valid & 0x40 != 0
 
+    def get_array(self):
+        return self._data
+
+
+def unpack_eet_array(payloads):
+    return np.frombuffer(b''.join(payloads), dtype=_EET_DTYPE)
+
 
 #------------------------------------------------------------------------------
 # Decoded Receivers
 #------------------------------------------------------------------------------
 
 class rx_decoded_rm_vlc(rx_rm_vlc):
-    def __init__(self, host, port, chunk, mode, divisor, profile, level, bitrate, options):
-        super().__init__(host, port, chunk, mode, divisor, profile, level, bitrate, options)
-        self._codec = decode_rm_vlc(profile)
+    def __init__(self, host, port, chunk, mode, divisor, profile, level, bitrate, options, decoder_options=None, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, mode, divisor, profile, level, bitrate, options, gatherer, sockopt)
+        self.decoder_options = decoder_options
+        self._codec = decode_rm_vlc(profile, decoder_options)
 
     def open(self):
         self._codec.create()
         super().open()
         self.get_next_packet()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = self._codec.decode(data.payload)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
 class rx_decoded_rm_depth_ahat(rx_rm_depth_ahat):
-    def __init__(self, host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options):
-        super().__init__(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options)
-        self._codec = decode_rm_depth_ahat(profile_z, profile_ab)
+    def __init__(self, host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options, decoder_options=None, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options, gatherer, sockopt)
+        self.decoder_options = decoder_options
+        self._codec = decode_rm_depth_ahat(profile_z, profile_ab, decoder_options)
 
     def open(self):
         self._codec.create()
         super().open()
         self.get_next_packet()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = self._codec.decode(data.payload)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
 class rx_decoded_rm_depth_longthrow(rx_rm_depth_longthrow):
-    def __init__(self, host, port, chunk, mode, divisor, png_filter):
-        super().__init__(host, port, chunk, mode, divisor, png_filter)
+    def __init__(self, host, port, chunk, mode, divisor, png_filter, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, mode, divisor, png_filter, gatherer, sockopt)
 
     def open(self):
         super().open()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = decode_rm_depth_longthrow(data.payload)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
 class rx_decoded_pv(rx_pv):
-    def __init__(self, host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, format):
-        super().__init__(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options)
+    def __init__(self, host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, format, decoder_options=None, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, gatherer, sockopt)
         self.format = format
-        self._codec = decode_pv(profile)
+        self.decoder_options = decoder_options
+        self._codec = decode_pv(profile, decoder_options)
 
     def open(self):        
         self._codec.create(self.width, self.height)
         super().open()
         self.get_next_packet()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = unpack_pv(data.payload)
         data.payload.image = self._codec.decode(data.payload.image, self.format)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
 class rx_decoded_microphone(rx_microphone):
-    def __init__(self, host, port, chunk, profile, level):
-        super().__init__(host, port, chunk, profile, level)
+    def __init__(self, host, port, chunk, profile, level, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, profile, level, gatherer, sockopt)
         self._codec = decode_microphone(profile)
         
     def open(self):
         self._codec.create()
         super().open()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = self._codec.decode(data.payload)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
 class rx_decoded_extended_audio(rx_extended_audio):
-    def __init__(self, host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level):
-        super().__init__(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level)
+    def __init__(self, host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer=GathererMode.COPY, sockopt=None):
+        super().__init__(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer, sockopt)
         self._codec = decode_microphone(profile)
         
     def open(self):
         self._codec.create()
         super().open()
 
-    def get_next_packet(self):
-        data = super().get_next_packet()
+    def _get_next_encoded_packet(self):
+        return super().get_next_packet()
+
+    def _decode_packet(self, data):
         data.payload = self._codec.decode(data.payload)
         return data
 
+    def get_next_packet(self):
+        return self._decode_packet(self._get_next_encoded_packet())
+
     def close(self):
         super().close()
 
 
+#------------------------------------------------------------------------------
+# Pipelined Decoded Receivers
+#------------------------------------------------------------------------------
+
+# Runs reception and decoding of a decoded receiver (rx_decoded_*) in two
+# threads connected by bounded queues of queue_size packets
+# Reception blocks when the queues are full (TCP backpressure)
+class rx_pipelined(_context_manager):
+    TIMEOUT = 0.1
+
+    def __init__(self, receiver, queue_size):
+        self.receiver = receiver
+        self.queue_size = queue_size
+
+    def _put(self, channel, item):
+        while (not self._event_stop.is_set()):
+            try:
+                channel.put(item, timeout=rx_pipelined.TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, channel):
+        while (not self._event_stop.is_set()):
+            try:
+                return channel.get(timeout=rx_pipelined.TIMEOUT)
+            except queue.Empty:
+                pass
+        return None
+
+    def _receive(self):
+        ring = getattr(self.receiver, 'gatherer', None) in (GathererMode.RING, GathererMode.DIRECT)
+        try:
+            while (not self._event_stop.is_set()):
+                data = self.receiver._get_next_encoded_packet()
+                if (ring):
+                    data = _packet(data.timestamp, bytearray(data.payload), None if (data.pose is None) else data.pose.copy())
+                if (not self._put(self._encoded, data)):
+                    break
+        except Exception as e:
+            self._put(self._encoded, e)
+
+    def _decode(self):
+        while (True):
+            data = self._get(self._encoded)
+            if (data is None):
+                break
+            if (not isinstance(data, Exception)):
+                try:
+                    data = self.receiver._decode_packet(data)
+                except Exception as e:
+                    data = e
+            if (not self._put(self._decoded, data)):
+                break
+            if (isinstance(data, Exception)):
+                return
+        # Stopped, wake up a caller waiting in get_next_packet
+        try:
+            self._decoded.put_nowait(Exception('receiver closed'))
+        except queue.Full:
+            pass
+
+    def open(self):
+        self.receiver.open()
+        self._event_stop = threading.Event()
+        self._encoded = queue.Queue(self.queue_size)
+        self._decoded = queue.Queue(self.queue_size)
+        self._thread_receive = threading.Thread(target=self._receive)
+        self._thread_decode = threading.Thread(target=self._decode)
+        self._thread_receive.start()
+        self._thread_decode.start()
+
+    def get_next_packet(self):
+        while (True):
+            try:
+                data = self._decoded.get(timeout=rx_pipelined.TIMEOUT)
+                break
+            except queue.Empty:
+                # The decode thread could not post its exit notice (full queue)
+                if ((not self._thread_decode.is_alive()) and self._decoded.empty()):
+                    raise Exception('receiver closed')
+        if (isinstance(data, Exception)):
+            raise data
+        return data
+
+    def close(self):
+        self._event_stop.set()
+        # Unblock the receive thread if it is waiting for data
+        self.receiver._client.shutdown()
+        self._thread_receive.join()
+        self._thread_decode.join()
+        self.receiver.close()
+
+
 #------------------------------------------------------------------------------
 # Mode 2 Data Acquisition
 #------------------------------------------------------------------------------
@@ -2019,15 +2430,25 @@ class ipc_sm(_context_manager):
         for _ in range(0, count):
             yield self._download_mesh()
     
-    def get_meshes(self, tasks, threads):
+    def _request_meshes(self, tasks, threads):
         count, data = tasks._get()
         msg = bytearray()
         msg.extend(struct.pack('<BII', ipc_sm._CMD_GET_MESHES, count, threads))
         msg.extend(data)
         self._client.sendall(msg)
+        return count
+
+    def get_meshes(self, tasks, threads):
+        count = self._request_meshes(tasks, threads)
         meshes = {index : mesh for index, mesh in self._download_meshes(count)}
         return meshes
 
+    def get_meshes_stream(self, tasks, threads):
+        # Yields (index, mesh) in arrival order, must be exhausted before the
+        # next request
+        count = self._request_meshes(tasks, threads)
+        return self._download_meshes(count)
+
     def close(self):
         self._client.close()
 
@@ -1,6 +1,10 @@
 
 import numpy as np
 import os
+import json
+import mmap
+import struct
+import zlib
 import cv2
 import hl2ss
 import hl2ss_lnm
@@ -192,6 +196,31 @@ def rm_depth_to_rgb(image):
     return np.dstack((image, image, image))
 
 
+def rm_depth_convert_undistort_map(undistort_map):
+    return cv2.convertMaps(undistort_map[:, :, 0], undistort_map[:, :, 1], cv2.CV_16SC2, nninterpolation=True)
+
+
+class rm_depth_undistort_normalizer:
+    def __init__(self, undistort_map, scale):
+        shape = undistort_map.shape[0:2]
+
+        self._map_1, self._map_2 = rm_depth_convert_undistort_map(undistort_map)
+        self._inverse_scale      = np.empty(shape,        dtype=np.float32)
+        self._undistorted        = np.empty(shape,        dtype=np.uint16)
+        self._depth              = np.empty(shape + (1,), dtype=np.float32)
+
+        np.divide(1, scale, out=self._inverse_scale)
+
+    def undistort(self, depth, out=None):
+        cv2.remap(depth, self._map_1, self._map_2, cv2.INTER_NEAREST, dst=self._undistorted)
+        return self.normalize(self._undistorted, out)
+
+    def normalize(self, depth, out=None):
+        out = self._depth if (out is None) else out
+        cv2.multiply(depth, self._inverse_scale, dst=out, dtype=cv2.CV_32F)
+        return out
+
+
 #------------------------------------------------------------------------------
 # PV
 #------------------------------------------------------------------------------
@@ -203,6 +232,93 @@ def pv_fix_calibration(intrinsics, extrinsics):
     return (intrinsics, extrinsics)
 
 
+#------------------------------------------------------------------------------
+# RM Depth to PV Registration
+#------------------------------------------------------------------------------
+
+class rm_depth_pv_registration:
+    def __init__(self, xy1, depth_extrinsics, pv_width, pv_height):
+        shape = xy1.shape[0:2]
+
+        self._xy1               = xy1
+        self._camera_to_rignode = camera_to_rignode(depth_extrinsics)
+        self._rignode_to_camera = rignode_to_camera(depth_extrinsics)
+        self._depth_pose        = None
+        self._pv_width          = pv_width
+        self._pv_height         = pv_height
+        self._lower             = (0.0, 0.0, float(np.finfo(np.float32).tiny))
+        self._upper             = (float(np.nextafter(pv_width, 0)), float(np.nextafter(pv_height, 0)), float(np.inf))
+        self._points            = np.empty(shape + (3,), dtype=np.float32)
+        self._projection        = np.empty(shape + (3,), dtype=np.float32)
+        self._uv                = np.empty(shape + (2,), dtype=np.float32)
+        self._valid             = np.empty(shape,        dtype=np.uint8)
+        self._reject            = np.empty(shape,        dtype=np.uint8)
+        self._invalid           = np.empty(shape + (1,), dtype=np.bool_)
+        self._uv_reject         = np.full(shape + (2,), -1, dtype=np.float32)
+        self._depth_reject      = np.zeros(shape + (1,),    dtype=np.float32)
+        self._depth             = np.empty(shape + (1,), dtype=np.float32)
+        self._pv_depth          = np.empty((pv_height, pv_width), dtype=np.float32)
+        self._registered        = self._depth
+
+    def update(self, depth, depth_pose, pv_intrinsics, pv_extrinsics, pv_pose, out=None):
+        self._depth_pose = depth_pose
+        depth_to_pv_image = self._camera_to_rignode @ reference_to_world(depth_pose) @ world_to_reference(pv_pose) @ rignode_to_camera(pv_extrinsics) @ camera_to_image(pv_intrinsics)
+        # Row vector to column vector layout with the third output fixed to 1 so perspectiveTransform yields (u, v, 1/w)
+        projection = np.vstack((depth_to_pv_image[:, 0], depth_to_pv_image[:, 1], (0, 0, 0, 1), depth_to_pv_image[:, 2])).astype(np.float64)
+
+        depth = depth.reshape(self._invalid.shape)
+
+        np.multiply(self._xy1, depth, out=self._points)
+        cv2.perspectiveTransform(self._points, projection, self._projection)
+        cv2.mixChannels([self._projection], [self._uv], [0, 0, 1, 1])
+        cv2.inRange(self._projection, self._lower, self._upper, self._valid)
+        cv2.bitwise_not(self._valid, self._reject)
+        np.equal(self._valid, 0, out=self._invalid[:, :, 0])
+        cv2.copyTo(self._uv_reject, self._reject, self._uv)
+
+        registered = self._depth if (out is None) else out.reshape(self._invalid.shape)
+        if (registered is not depth):
+            np.copyto(registered, depth)
+        cv2.copyTo(self._depth_reject, self._reject, registered)
+        self._registered = registered
+
+        return self._depth if (out is None) else out
+
+    def get_uv(self):
+        return self._uv
+
+    def get_world_to_depth(self):
+        return world_to_reference(self._depth_pose) @ self._rignode_to_camera
+
+    def get_mask(self):
+        return self._invalid
+
+    def color_to_depth(self, image, interpolation=cv2.INTER_LINEAR, out=None):
+        return cv2.remap(image, self._uv, None, interpolation, dst=out, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    def depth_to_pv(self, out=None):
+        pv_depth = self._pv_depth if (out is None) else out
+        pv_depth.fill(0)
+
+        select = self._registered[:, :, 0] > 0
+        z  = 1 / self._projection[:, :, 2][select]
+        uv = self._uv[select]
+
+        u = (uv[:, 0] + 0.5).astype(np.int32)
+        v = (uv[:, 1] + 0.5).astype(np.int32)
+        inside = (u < self._pv_width) & (v < self._pv_height)
+        index = v[inside] * self._pv_width + u[inside]
+        z = z[inside]
+
+        # Keep the nearest point when several points land on the same pixel
+        order = np.lexsort((z, index))
+        index, first = np.unique(index[order], return_index=True)
+
+        pv_depth[index // self._pv_width, index % self._pv_width] = z[order][first]
+
+        return pv_depth
+
+
 #------------------------------------------------------------------------------
 # SM
 #------------------------------------------------------------------------------
@@ -229,6 +345,62 @@ def sm_mesh_normalize(mesh):
     sm_mesh_normalize_normals(mesh)
 
 
+def _sm_mesh_is_affine(pose):
+    return np.array_equal(pose[:, 3], [0, 0, 0, 1])
+
+
+def sm_mesh_normalize_positions_inplace(mesh):
+    if (not _sm_mesh_is_affine(mesh.pose)):
+        sm_mesh_normalize_positions(mesh)
+        return
+    positions = mesh.vertex_positions
+    xyz = positions[:, 0:3]
+    w = positions[:, 3]
+    # Normalized integer formats store a constant w which folds into the 3x3
+    if ((w.shape[0] > 0) and np.all(w == w[0])):
+        np.matmul(xyz, (mesh.vertex_position_scale.reshape((3, 1)) / w[0]) * mesh.pose[:3, :3], out=xyz)
+    else:
+        xyz *= mesh.vertex_position_scale
+        xyz /= w[:, np.newaxis]
+        np.matmul(xyz, mesh.pose[:3, :3], out=xyz)
+    xyz += mesh.pose[3, :3]
+    w[:] = 1
+
+
+def sm_mesh_normalize_normals_inplace(mesh):
+    if (not _sm_mesh_is_affine(mesh.pose)):
+        sm_mesh_normalize_normals(mesh)
+        return
+    normals = mesh.vertex_normals
+    xyz = normals[:, 0:3]
+    d = np.linalg.norm(normals, axis=1)
+    d[d <= 0] = 1
+    normals /= d[:, np.newaxis]
+    np.matmul(xyz, mesh.pose[:3, :3], out=xyz)
+    if (np.any(normals[:, 3])):
+        xyz += normals[:, 3:] * mesh.pose[3, :3]
+
+
+def sm_mesh_normalize_inplace(mesh):
+    # Same result as sm_mesh_normalize without changing the dtype of the
+    # mesh arrays, which must be floating point and writable
+    sm_mesh_normalize_positions_inplace(mesh)
+    sm_mesh_normalize_normals_inplace(mesh)
+
+
+def sm_compute_frustum(intrinsics, camera2world, width, height, near, far):
+    # Planes (a, b, c, d) in sm_bounding_volume.add_frustum order with normals
+    # pointing outwards, a point p is inside if a*x + b*y + c*z + d <= 0
+    left   = -intrinsics[2, 0] / intrinsics[0, 0]
+    right  = (width - intrinsics[2, 0]) / intrinsics[0, 0]
+    top    = -intrinsics[2, 1] / intrinsics[1, 1]
+    bottom = (height - intrinsics[2, 1]) / intrinsics[1, 1]
+    planes = np.array([[0, 0, -1, near], [0, 0, 1, -far], [1, 0, -right, 0], [-1, 0, left, 0], [0, -1, top, 0], [0, 1, -bottom, 0]], dtype=np.float64)
+    planes = planes / compute_norm(planes[:, 0:3])[:, np.newaxis]
+    normals = planes[:, 0:3] @ camera2world[:3, :3]
+    return np.hstack((normals, (planes[:, 3] - normals @ camera2world[3, :3])[:, np.newaxis])).astype(np.float32)
+
+
 #------------------------------------------------------------------------------
 # SU
 #------------------------------------------------------------------------------
@@ -241,43 +413,6 @@ def su_normalize(mesh, location):
 # Calibration
 #------------------------------------------------------------------------------
 
-def _save_calibration_rm_vlc(calibration, path):
-    calibration.uv2xy                .tofile(os.path.join(path, 'uv2xy.bin'))
-    calibration.extrinsics           .tofile(os.path.join(path, 'extrinsics.bin'))
-    calibration.undistort_map        .tofile(os.path.join(path, 'undistort_map.bin'))
-    calibration.intrinsics           .tofile(os.path.join(path, 'intrinsics.bin'))
-
-
-def _save_calibration_rm_depth_ahat(calibration, path):
-    calibration.uv2xy                .tofile(os.path.join(path, 'uv2xy.bin'))
-    calibration.extrinsics           .tofile(os.path.join(path, 'extrinsics.bin'))
-    calibration.scale                .tofile(os.path.join(path, 'scale.bin'))
-    calibration.alias                .tofile(os.path.join(path, 'alias.bin'))
-    calibration.undistort_map        .tofile(os.path.join(path, 'undistort_map.bin'))
-    calibration.intrinsics           .tofile(os.path.join(path, 'intrinsics.bin'))
-
-
-def _save_calibration_rm_depth_longthrow(calibration, path):
-    calibration.uv2xy                .tofile(os.path.join(path, 'uv2xy.bin'))
-    calibration.extrinsics           .tofile(os.path.join(path, 'extrinsics.bin'))
-    calibration.scale                .tofile(os.path.join(path, 'scale.bin'))
-    calibration.undistort_map        .tofile(os.path.join(path, 'undistort_map.bin'))
-    calibration.intrinsics           .tofile(os.path.join(path, 'intrinsics.bin'))
-
-
-def _save_calibration_rm_imu(calibration, path):
-    calibration.extrinsics           .tofile(os.path.join(path, 'extrinsics.bin'))
-
-
-def _save_calibration_pv(calibration, path):
-    calibration.focal_length         .tofile(os.path.join(path, 'focal_length.bin'))
-    calibration.principal_point      .tofile(os.path.join(path, 'principal_point.bin'))
-    calibration.radial_distortion    .tofile(os.path.join(path, 'radial_distortion.bin'))
-    calibration.tangential_distortion.tofile(os.path.join(path, 'tangential_distortion.bin'))
-    calibration.projection           .tofile(os.path.join(path, 'projection.bin'))
-    calibration.intrinsics           .tofile(os.path.join(path, 'intrinsics.bin'))
-
-
 def _save_extrinsics_pv(extrinsics, path):
     extrinsics                       .tofile(os.path.join(path, 'extrinsics.bin'))
 
@@ -342,45 +477,154 @@ def _load_extrinsics_pv(path):
 
 
 #------------------------------------------------------------------------------
-# Calibration Wrappers
+# Calibration Store
 #------------------------------------------------------------------------------
 
-def _download_calibration_rm(host, port):
-    if (port == hl2ss.StreamPort.RM_VLC_LEFTFRONT):
-        return hl2ss_lnm.download_calibration_rm_vlc(            host, port)
-    if (port == hl2ss.StreamPort.RM_VLC_LEFTLEFT):
-        return hl2ss_lnm.download_calibration_rm_vlc(            host, port)
-    if (port == hl2ss.StreamPort.RM_VLC_RIGHTFRONT):
-        return hl2ss_lnm.download_calibration_rm_vlc(            host, port)
-    if (port == hl2ss.StreamPort.RM_VLC_RIGHTRIGHT):
-        return hl2ss_lnm.download_calibration_rm_vlc(            host, port)
-    if (port == hl2ss.StreamPort.RM_DEPTH_AHAT):
-        return hl2ss_lnm.download_calibration_rm_depth_ahat(     host, port)
-    if (port == hl2ss.StreamPort.RM_DEPTH_LONGTHROW):
-        return hl2ss_lnm.download_calibration_rm_depth_longthrow(host, port)
-    if (port == hl2ss.StreamPort.RM_IMU_ACCELEROMETER):
-        return hl2ss_lnm.download_calibration_rm_imu(            host, port)
-    if (port == hl2ss.StreamPort.RM_IMU_GYROSCOPE):
-        return hl2ss_lnm.download_calibration_rm_imu(            host, port)
+class _CalibrationStore:
+    MAGIC                     = b'HL2SSCAL'
+    VERSION                   = 1
+    ALIGNMENT                 = 64
+    EXTENSION                 = '.calibration'
+    PREFIX                    = struct.Struct('<8sIII')
+    MAPPED                    = ('uv2xy', 'undistort_map')
+    FIELDS_RM_VLC             = ('uv2xy', 'extrinsics', 'undistort_map', 'intrinsics')
+    FIELDS_RM_DEPTH_AHAT      = ('uv2xy', 'extrinsics', 'scale', 'alias', 'undistort_map', 'intrinsics')
+    FIELDS_RM_DEPTH_LONGTHROW = ('uv2xy', 'extrinsics', 'scale', 'undistort_map', 'intrinsics')
+    FIELDS_RM_IMU             = ('extrinsics',)
+    FIELDS_PV                 = ('focal_length', 'principal_point', 'radial_distortion', 'tangential_distortion', 'projection', 'intrinsics')
+
+
+_calibration_cache = dict()
+
+
+def _calibration_store_align(offset):
+    return (offset + _CalibrationStore.ALIGNMENT - 1) & ~(_CalibrationStore.ALIGNMENT - 1)
+
+
+def _release_calibration_store(filename):
+    cached = _calibration_cache.pop(filename, None)
+    if (cached is not None):
+        try:
+            cached[2].close()
+        except BufferError:
+            # Arrays returned to callers keep the mapping alive
+            pass
+
+
+def _replace_calibration_store(temporary, filename):
+    _release_calibration_store(filename)
+    try:
+        os.replace(temporary, filename)
+    except PermissionError:
+        # Windows cannot replace a file that is still mapped (by views held by
+        # callers or by another process), keep the old file since overwriting
+        # it would tear the views of the processes that mapped it
+        os.remove(temporary)
+        raise IOError('Calibration file ' + filename + ' is in use and cannot be replaced')
+
+
+def _save_calibration_store(filename, key, calibration, names):
+    arrays  = [np.ascontiguousarray(getattr(calibration, name)) for name in names]
+    entries = []
+    offset  = 0
+
+    for name, array in zip(names, arrays):
+        entries.append({'name' : name, 'dtype' : array.dtype.str, 'shape' : list(array.shape), 'offset' : offset, 'size' : array.nbytes, 'crc32' : zlib.crc32(array)})
+        offset = _calibration_store_align(offset + array.nbytes)
+
+    header = json.dumps({'key' : key, 'fields' : entries}).encode('utf-8')
+    prefix = _CalibrationStore.PREFIX.pack(_CalibrationStore.MAGIC, _CalibrationStore.VERSION, len(header), zlib.crc32(header))
+    base   = _calibration_store_align(len(prefix) + len(header))
+
+    # Write to a temporary file and rename so concurrent readers never see a partial container
+    temporary = f'{filename}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(prefix)
+        file.write(header)
+        for entry, array in zip(entries, arrays):
+            file.seek(base + entry['offset'])
+            file.write(array.tobytes())
+        file.truncate(base + offset)
+    _replace_calibration_store(temporary, filename)
+
+
+def _load_calibration_store(filename, key):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _calibration_cache.get(filename, None)
+    if ((cached is not None) and (cached[0] == signature)):
+        return cached[1]
+
+    if (stat.st_size < _CalibrationStore.PREFIX.size):
+        raise IOError('Calibration file ' + filename + ' is truncated')
+
+    with open(filename, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_size, header_crc32 = _CalibrationStore.PREFIX.unpack_from(buffer, 0)
+    if (magic != _CalibrationStore.MAGIC):
+        raise IOError('Calibration file ' + filename + ' has an invalid signature')
+    if (version != _CalibrationStore.VERSION):
+        return None
+
+    begin = _CalibrationStore.PREFIX.size
+    end   = begin + header_size
+    if (len(buffer) < end):
+        raise IOError('Calibration file ' + filename + ' is truncated')
+    header = buffer[begin:end]
+    if (zlib.crc32(header) != header_crc32):
+        raise IOError('Calibration file ' + filename + ' header checksum mismatch')
+    header = json.loads(header.decode('utf-8'))
+    if (header['key'] != key):
+        raise IOError('Calibration file ' + filename + ' belongs to ' + str(header['key']) + ', expected ' + str(key))
+
+    base   = _calibration_store_align(end)
+    fields = dict()
+
+    for entry in header['fields']:
+        dtype = np.dtype(entry['dtype'])
+        if (base + entry['offset'] + entry['size'] > len(buffer)):
+            raise IOError('Calibration file ' + filename + ' is truncated')
+        array = np.frombuffer(buffer, dtype=dtype, count=entry['size'] // dtype.itemsize, offset=base + entry['offset']).reshape(entry['shape'])
+        if (zlib.crc32(array) != entry['crc32']):
+            raise IOError('Calibration file ' + filename + ' field ' + entry['name'] + ' checksum mismatch')
+        fields[entry['name']] = array
+
+    _calibration_cache[filename] = (signature, fields, buffer)
+
+    return fields
+
+
+def _calibration_from_store(mode2, names, fields):
+    # LUTs stay read-only views of the shared mapping, small fields are copied since callers may modify them in place
+    return mode2(*[fields[name] if (name in _CalibrationStore.MAPPED) else fields[name].copy() for name in names])
 
 
-def _save_calibration_rm(port, calibration, path):
+#------------------------------------------------------------------------------
+# Calibration Wrappers
+#------------------------------------------------------------------------------
+
+def _calibration_layout_rm(port):
     if (port == hl2ss.StreamPort.RM_VLC_LEFTFRONT):
-        return _save_calibration_rm_vlc(            calibration, path)
+        return (hl2ss._Mode2_RM_VLC,                _CalibrationStore.FIELDS_RM_VLC)
     if (port == hl2ss.StreamPort.RM_VLC_LEFTLEFT):
-        return _save_calibration_rm_vlc(            calibration, path)
+        return (hl2ss._Mode2_RM_VLC,                _CalibrationStore.FIELDS_RM_VLC)
     if (port == hl2ss.StreamPort.RM_VLC_RIGHTFRONT):
-        return _save_calibration_rm_vlc(            calibration, path)
+        return (hl2ss._Mode2_RM_VLC,                _CalibrationStore.FIELDS_RM_VLC)
     if (port == hl2ss.StreamPort.RM_VLC_RIGHTRIGHT):
-        return _save_calibration_rm_vlc(            calibration, path)
+        return (hl2ss._Mode2_RM_VLC,                _CalibrationStore.FIELDS_RM_VLC)
     if (port == hl2ss.StreamPort.RM_DEPTH_AHAT):
-        return _save_calibration_rm_depth_ahat(     calibration, path)
+        return (hl2ss._Mode2_RM_DEPTH_AHAT,         _CalibrationStore.FIELDS_RM_DEPTH_AHAT)
     if (port == hl2ss.StreamPort.RM_DEPTH_LONGTHROW):
-        return _save_calibration_rm_depth_longthrow(calibration, path)
+        return (hl2ss._Mode2_RM_DEPTH_LONGTHROW,    _CalibrationStore.FIELDS_RM_DEPTH_LONGTHROW)
     if (port == hl2ss.StreamPort.RM_IMU_ACCELEROMETER):
-        return _save_calibration_rm_imu(            calibration, path)
+        return (hl2ss._Mode2_RM_IMU,                _CalibrationStore.FIELDS_RM_IMU)
     if (port == hl2ss.StreamPort.RM_IMU_GYROSCOPE):
-        return _save_calibration_rm_imu(            calibration, path)
+        return (hl2ss._Mode2_RM_IMU,                _CalibrationStore.FIELDS_RM_IMU)
 
     return None
 
@@ -429,21 +673,71 @@ def _calibration_subdirectory_pv(focus, width, height, path):
     return os.path.join(path, f'{int(focus)}_{int(width)}_{int(height)}')
 
 
-def get_calibration_rm(host, port, path):
+def _calibration_file(base):
+    return base + _CalibrationStore.EXTENSION
+
+
+def _calibration_key(base, path):
+    return os.path.relpath(base, path).replace(os.sep, '/')
+
+
+def _import_calibration_rm(host, port, base):
+    try:
+        return _load_calibration_rm(port, base)
+    except (FileNotFoundError, ValueError):
+        return hl2ss_lnm.download_calibration_rm(host, port)
+
+
+def _import_calibration_pv(host, port, width, height, framerate, base):
+    try:
+        return _load_calibration_pv(base)
+    except (FileNotFoundError, ValueError):
+        return hl2ss_lnm.download_calibration_pv(host, port, width, height, framerate)
+
+
+def save_calibration_rm(port, calibration, path):
     _check_calibration_directory(path)
 
     base = _calibration_subdirectory(port, path)
+    _, names = _calibration_layout_rm(port)
+
+    return _save_calibration_store(_calibration_file(base), _calibration_key(base, path), calibration, names)
+
+
+def save_calibration_pv(port, calibration, path, focus, width, height):
+    _check_calibration_directory(path)
+
+    root = _calibration_subdirectory(port, path)
+    base = _calibration_subdirectory_pv(focus, width, height, root)
+    os.makedirs(root, exist_ok=True)
+
+    return _save_calibration_store(_calibration_file(base), _calibration_key(base, path), calibration, _CalibrationStore.FIELDS_PV)
+
+
+def _get_calibration_rm_store(port, path):
+    base = _calibration_subdirectory(port, path)
+    mode2, names = _calibration_layout_rm(port)
+    fields = _load_calibration_store(_calibration_file(base), _calibration_key(base, path))
+    return None if (fields is None) else _calibration_from_store(mode2, names, fields)
 
-    try:
-        calibration = _load_calibration_rm(port, base)
-    except:
-        calibration = _download_calibration_rm(host, port)
-        os.makedirs(base, exist_ok=True)
-        _save_calibration_rm(port, calibration, base)
+
+def get_calibration_rm(host, port, path):
+    _check_calibration_directory(path)
+
+    calibration = _get_calibration_rm_store(port, path)
+    if (calibration is None):
+        save_calibration_rm(port, _import_calibration_rm(host, port, _calibration_subdirectory(port, path)), path)
+        calibration = _get_calibration_rm_store(port, path)
 
     return calibration
 
 
+def _get_calibration_pv_store(port, path, focus, width, height):
+    base = _calibration_subdirectory_pv(focus, width, height, _calibration_subdirectory(port, path))
+    fields = _load_calibration_store(_calibration_file(base), _calibration_key(base, path))
+    return None if (fields is None) else _calibration_from_store(hl2ss._Mode2_PV, _CalibrationStore.FIELDS_PV, fields)
+
+
 def get_calibration_pv(host, port, path, focus, width, height, framerate, load_extrinsics):
     _check_calibration_directory(path)
 
@@ -451,16 +745,66 @@ def get_calibration_pv(host, port, path, focus, width, height, framerate, load_e
     base = _calibration_subdirectory_pv(focus, width, height, root)
     extrinsics = _load_extrinsics_pv(root) if (load_extrinsics) else None
 
-    try:
-        calibration = _load_calibration_pv(base)
-    except:
-        calibration = hl2ss_lnm.download_calibration_pv(host, port, width, height, framerate)
-        os.makedirs(base, exist_ok=True)
-        _save_calibration_pv(calibration, base)
-        
+    calibration = _get_calibration_pv_store(port, path, focus, width, height)
+    if (calibration is None):
+        save_calibration_pv(port, _import_calibration_pv(host, port, width, height, framerate, base), path, focus, width, height)
+        calibration = _get_calibration_pv_store(port, path, focus, width, height)
+
     return _Mode2_PV(calibration, extrinsics)
 
 
+def _get_calibration_store_any(port, path, pv):
+    return _get_calibration_pv_store(port, path, *pv) if (port == hl2ss.StreamPort.PERSONAL_VIDEO) else _get_calibration_rm_store(port, path)
+
+
+def _load_calibration_any(port, path, pv):
+    return _load_calibration_pv(_calibration_subdirectory_pv(*pv, _calibration_subdirectory(port, path))) if (port == hl2ss.StreamPort.PERSONAL_VIDEO) else _load_calibration_rm(port, _calibration_subdirectory(port, path))
+
+
+def _save_calibration_any(port, calibration, path, pv):
+    return save_calibration_pv(port, calibration, path, *pv) if (port == hl2ss.StreamPort.PERSONAL_VIDEO) else save_calibration_rm(port, calibration, path)
+
+
+def get_calibration_many(host, ports, path, pv_focus=None, pv_width=1920, pv_height=1080, pv_framerate=30, pv_load_extrinsics=False, max_workers=None):
+    _check_calibration_directory(path)
+
+    for port in ports:
+        if ((port != hl2ss.StreamPort.PERSONAL_VIDEO) and (_calibration_layout_rm(port) is None)):
+            raise Exception('Calibration is not available for port ' + str(port))
+        if ((port == hl2ss.StreamPort.PERSONAL_VIDEO) and (pv_focus is None)):
+            raise Exception('PV calibration requires pv_focus')
+
+    pv = (pv_focus, pv_width, pv_height)
+    calibrations = {port : _get_calibration_store_any(port, path, pv) for port in ports}
+    missing = []
+
+    for port in [port for port, calibration in calibrations.items() if (calibration is None)]:
+        try:
+            _save_calibration_any(port, _load_calibration_any(port, path, pv), path, pv)
+        except (FileNotFoundError, ValueError):
+            missing.append(port)
+
+    downloads, elapsed = hl2ss_lnm.download_calibration_many(host, missing, pv_width, pv_height, pv_framerate, max_workers)
+    for port, calibration in downloads.items():
+        _save_calibration_any(port, calibration, path, pv)
+
+    calibrations = {port : _get_calibration_store_any(port, path, pv) if (calibration is None) else calibration for port, calibration in calibrations.items()}
+
+    if (hl2ss.StreamPort.PERSONAL_VIDEO in calibrations):
+        extrinsics = _load_extrinsics_pv(_calibration_subdirectory(hl2ss.StreamPort.PERSONAL_VIDEO, path)) if (pv_load_extrinsics) else None
+        calibrations[hl2ss.StreamPort.PERSONAL_VIDEO] = _Mode2_PV(calibrations[hl2ss.StreamPort.PERSONAL_VIDEO], extrinsics)
+
+    return (calibrations, elapsed)
+
+
+def get_calibration_rm_many(host, ports, path, max_workers=None):
+    for port in ports:
+        if (_calibration_layout_rm(port) is None):
+            raise Exception('Port ' + str(port) + ' is not an RM port, use get_calibration_many for PV')
+
+    return get_calibration_many(host, ports, path, max_workers=max_workers)
+
+
 def save_extrinsics_pv(port, extrinsics, path):
     _check_calibration_directory(path)
 
@@ -0,0 +1,560 @@
+import asyncio
+import concurrent.futures
+import socket
+import struct
+import numpy as np
+import hl2ss
+
+
+#------------------------------------------------------------------------------
+# Network Client
+#------------------------------------------------------------------------------
+
+class _client:
+    LIMIT = 4*1024*1024
+
+    async def open(self, host, port, sockopt):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if (sockopt is not None):
+            for (level, name), value in sockopt.items():
+                s.setsockopt(level, name, value)
+        s.setblocking(False)
+        try:
+            await asyncio.get_running_loop().sock_connect(s, (host, port))
+        except:
+            s.close()
+            raise
+        self._reader, self._writer = await asyncio.open_connection(sock=s, limit=_client.LIMIT)
+
+    async def sendall(self, data):
+        self._writer.write(data)
+        await self._writer.drain()
+
+    async def download(self, total):
+        return await self._reader.readexactly(total)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+#------------------------------------------------------------------------------
+# Packet Gatherer
+#------------------------------------------------------------------------------
+
+class _gatherer:
+    async def open(self, host, port, mode, sockopt):
+        self._client = _client()
+        self._mode = mode
+        await self._client.open(host, port, sockopt)
+
+    async def sendall(self, data):
+        await self._client.sendall(data)
+
+    async def get_next_packet(self):
+        timestamp, size = struct.unpack('<QI', await self._client.download(12))
+        payload = await self._client.download(size)
+        pose = np.frombuffer(await self._client.download(64), dtype=np.float32).reshape((4, 4)) if (self._mode == hl2ss.StreamMode.MODE_1) else None
+        return hl2ss._packet(timestamp, payload, pose)
+
+    async def close(self):
+        await self._client.close()
+
+
+#------------------------------------------------------------------------------
+# Mode 0 and Mode 1 Data Acquisition
+#------------------------------------------------------------------------------
+
+async def _connect_client(host, port, mode, configuration, sockopt):
+    c = _gatherer()
+    await c.open(host, port, mode, sockopt)
+    await c.sendall(configuration)
+    return c
+
+
+async def _connect_client_rm_vlc(host, port, mode, divisor, profile, level, bitrate, options, sockopt):
+    return await _connect_client(host, port, mode, hl2ss._create_configuration_for_rm_vlc(mode, divisor, profile, level, bitrate, options), sockopt)
+
+
+async def _connect_client_rm_depth_ahat(host, port, mode, divisor, profile_z, profile_ab, level, bitrate, options, sockopt):
+    return await _connect_client(host, port, mode, hl2ss._create_configuration_for_rm_depth_ahat(mode, divisor, profile_z, profile_ab, level, bitrate, options), sockopt)
+
+
+async def _connect_client_rm_depth_longthrow(host, port, mode, divisor, png_filter, sockopt):
+    return await _connect_client(host, port, mode, hl2ss._create_configuration_for_rm_depth_longthrow(mode, divisor, png_filter), sockopt)
+
+
+async def _connect_client_rm_imu(host, port, mode, sockopt):
+    return await _connect_client(host, port, mode, hl2ss._create_configuration_for_rm_imu(mode), sockopt)
+
+
+async def _connect_client_pv(host, port, mode, width, height, framerate, divisor, profile, level, bitrate, options, sockopt):
+    return await _connect_client(host, port, mode, hl2ss._create_configuration_for_pv(mode, width, height, framerate, divisor, profile, level, bitrate, options), sockopt)
+
+
+async def _connect_client_microphone(host, port, profile, level, sockopt):
+    return await _connect_client(host, port, hl2ss.StreamMode.MODE_0, hl2ss._create_configuration_for_microphone(profile, level), sockopt)
+
+
+async def _connect_client_si(host, port, sockopt):
+    return await _connect_client(host, port, hl2ss.StreamMode.MODE_0, b'', sockopt)
+
+
+async def _connect_client_eet(host, port, fps, sockopt):
+    return await _connect_client(host, port, hl2ss.StreamMode.MODE_1, hl2ss._create_configuration_for_eet(fps), sockopt)
+
+
+async def _connect_client_extended_audio(host, port, mixer_mode, loopback_gain, microphone_gain, profile, level, sockopt):
+    return await _connect_client(host, port, hl2ss.StreamMode.MODE_0, hl2ss._create_configuration_for_extended_audio(mixer_mode, loopback_gain, microphone_gain, profile, level), sockopt)
+
+
+#------------------------------------------------------------------------------
+# Context Manager
+#------------------------------------------------------------------------------
+
+class _context_manager:
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get_next_packet()
+        except asyncio.IncompleteReadError:
+            raise StopAsyncIteration
+
+
+#------------------------------------------------------------------------------
+# Receiver Wrappers
+#------------------------------------------------------------------------------
+
+class rx_rm_vlc(_context_manager):
+    def __init__(self, host, port, mode, divisor, profile, level, bitrate, options, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.divisor = divisor
+        self.profile = profile
+        self.level = level
+        self.bitrate = bitrate
+        self.options = options
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_rm_vlc(self.host, self.port, self.mode, self.divisor, self.profile, self.level, self.bitrate, self.options, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_rm_depth_ahat(_context_manager):
+    def __init__(self, host, port, mode, divisor, profile_z, profile_ab, level, bitrate, options, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.divisor = divisor
+        self.profile_z = profile_z
+        self.profile_ab = profile_ab
+        self.level = level
+        self.bitrate = bitrate
+        self.options = options
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_rm_depth_ahat(self.host, self.port, self.mode, self.divisor, self.profile_z, self.profile_ab, self.level, self.bitrate, self.options, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_rm_depth_longthrow(_context_manager):
+    def __init__(self, host, port, mode, divisor, png_filter, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.divisor = divisor
+        self.png_filter = png_filter
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_rm_depth_longthrow(self.host, self.port, self.mode, self.divisor, self.png_filter, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_rm_imu(_context_manager):
+    def __init__(self, host, port, mode, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_rm_imu(self.host, self.port, self.mode, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_pv(_context_manager):
+    def __init__(self, host, port, mode, width, height, framerate, divisor, profile, level, bitrate, options, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.width = width
+        self.height = height
+        self.framerate = framerate
+        self.divisor = divisor
+        self.profile = profile
+        self.level = level
+        self.bitrate = bitrate
+        self.options = options
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_pv(self.host, self.port, self.mode, self.width, self.height, self.framerate, self.divisor, self.profile, self.level, self.bitrate, self.options, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_microphone(_context_manager):
+    def __init__(self, host, port, profile, level, sockopt=None):
+        self.host = host
+        self.port = port
+        self.profile = profile
+        self.level = level
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_microphone(self.host, self.port, self.profile, self.level, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_si(_context_manager):
+    def __init__(self, host, port, sockopt=None):
+        self.host = host
+        self.port = port
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_si(self.host, self.port, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_eet(_context_manager):
+    def __init__(self, host, port, fps, sockopt=None):
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_eet(self.host, self.port, self.fps, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+class rx_extended_audio(_context_manager):
+    def __init__(self, host, port, mixer_mode, loopback_gain, microphone_gain, profile, level, sockopt=None):
+        self.host = host
+        self.port = port
+        self.mixer_mode = mixer_mode
+        self.loopback_gain = loopback_gain
+        self.microphone_gain = microphone_gain
+        self.profile = profile
+        self.level = level
+        self.sockopt = sockopt
+
+    async def open(self):
+        self._client = await _connect_client_extended_audio(self.host, self.port, self.mixer_mode, self.loopback_gain, self.microphone_gain, self.profile, self.level, self.sockopt)
+
+    async def get_next_packet(self):
+        return await self._client.get_next_packet()
+
+    async def close(self):
+        await self._client.close()
+
+
+#------------------------------------------------------------------------------
+# Decoded Receivers
+#------------------------------------------------------------------------------
+
+# Decoding runs in a worker thread so that it does not stall the other
+# receivers sharing the event loop
+async def _decode(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+class rx_decoded_rm_vlc(rx_rm_vlc):
+    def __init__(self, host, port, mode, divisor, profile, level, bitrate, options, decoder_options=None, sockopt=None):
+        super().__init__(host, port, mode, divisor, profile, level, bitrate, options, sockopt)
+        self.decoder_options = decoder_options
+        self._codec = hl2ss.decode_rm_vlc(profile, decoder_options)
+
+    async def open(self):
+        self._codec.create()
+        await super().open()
+        await self.get_next_packet()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = await _decode(self._codec.decode, data.payload)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+class rx_decoded_rm_depth_ahat(rx_rm_depth_ahat):
+    def __init__(self, host, port, mode, divisor, profile_z, profile_ab, level, bitrate, options, decoder_options=None, sockopt=None):
+        super().__init__(host, port, mode, divisor, profile_z, profile_ab, level, bitrate, options, sockopt)
+        self.decoder_options = decoder_options
+        self._codec = hl2ss.decode_rm_depth_ahat(profile_z, profile_ab, decoder_options)
+
+    async def open(self):
+        self._codec.create()
+        await super().open()
+        await self.get_next_packet()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = await _decode(self._codec.decode, data.payload)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+class rx_decoded_rm_depth_longthrow(rx_rm_depth_longthrow):
+    def __init__(self, host, port, mode, divisor, png_filter, sockopt=None):
+        super().__init__(host, port, mode, divisor, png_filter, sockopt)
+
+    async def open(self):
+        await super().open()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = await _decode(hl2ss.decode_rm_depth_longthrow, data.payload)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+class rx_decoded_pv(rx_pv):
+    def __init__(self, host, port, mode, width, height, framerate, divisor, profile, level, bitrate, options, format, decoder_options=None, sockopt=None):
+        super().__init__(host, port, mode, width, height, framerate, divisor, profile, level, bitrate, options, sockopt)
+        self.format = format
+        self.decoder_options = decoder_options
+        self._codec = hl2ss.decode_pv(profile, decoder_options)
+
+    async def open(self):
+        self._codec.create(self.width, self.height)
+        await super().open()
+        await self.get_next_packet()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = hl2ss.unpack_pv(data.payload)
+        data.payload.image = await _decode(self._codec.decode, data.payload.image, self.format)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+class rx_decoded_microphone(rx_microphone):
+    def __init__(self, host, port, profile, level, sockopt=None):
+        super().__init__(host, port, profile, level, sockopt)
+        self._codec = hl2ss.decode_microphone(profile)
+
+    async def open(self):
+        self._codec.create()
+        await super().open()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = await _decode(self._codec.decode, data.payload)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+class rx_decoded_extended_audio(rx_extended_audio):
+    def __init__(self, host, port, mixer_mode, loopback_gain, microphone_gain, profile, level, sockopt=None):
+        super().__init__(host, port, mixer_mode, loopback_gain, microphone_gain, profile, level, sockopt)
+        self._codec = hl2ss.decode_microphone(profile)
+
+    async def open(self):
+        self._codec.create()
+        await super().open()
+
+    async def get_next_packet(self):
+        data = await super().get_next_packet()
+        data.payload = await _decode(self._codec.decode, data.payload)
+        return data
+
+    async def close(self):
+        await super().close()
+
+
+#------------------------------------------------------------------------------
+# Blocking Receiver Conversion
+#------------------------------------------------------------------------------
+
+def _create_from_rx_rm_vlc(rx):
+    return rx_rm_vlc(rx.host, rx.port, rx.mode, rx.divisor, rx.profile, rx.level, rx.bitrate, rx.options, rx.sockopt)
+
+
+def _create_from_rx_rm_depth_ahat(rx):
+    return rx_rm_depth_ahat(rx.host, rx.port, rx.mode, rx.divisor, rx.profile_z, rx.profile_ab, rx.level, rx.bitrate, rx.options, rx.sockopt)
+
+
+def _create_from_rx_rm_depth_longthrow(rx):
+    return rx_rm_depth_longthrow(rx.host, rx.port, rx.mode, rx.divisor, rx.png_filter, rx.sockopt)
+
+
+def _create_from_rx_rm_imu(rx):
+    return rx_rm_imu(rx.host, rx.port, rx.mode, rx.sockopt)
+
+
+def _create_from_rx_pv(rx):
+    return rx_pv(rx.host, rx.port, rx.mode, rx.width, rx.height, rx.framerate, rx.divisor, rx.profile, rx.level, rx.bitrate, rx.options, rx.sockopt)
+
+
+def _create_from_rx_microphone(rx):
+    return rx_microphone(rx.host, rx.port, rx.profile, rx.level, rx.sockopt)
+
+
+def _create_from_rx_si(rx):
+    return rx_si(rx.host, rx.port, rx.sockopt)
+
+
+def _create_from_rx_eet(rx):
+    return rx_eet(rx.host, rx.port, rx.fps, rx.sockopt)
+
+
+def _create_from_rx_extended_audio(rx):
+    return rx_extended_audio(rx.host, rx.port, rx.mixer_mode, rx.loopback_gain, rx.microphone_gain, rx.profile, rx.level, rx.sockopt)
+
+
+def _create_from_rx_decoded_rm_vlc(rx):
+    return rx_decoded_rm_vlc(rx.host, rx.port, rx.mode, rx.divisor, rx.profile, rx.level, rx.bitrate, rx.options, rx.decoder_options, rx.sockopt)
+
+
+def _create_from_rx_decoded_rm_depth_ahat(rx):
+    return rx_decoded_rm_depth_ahat(rx.host, rx.port, rx.mode, rx.divisor, rx.profile_z, rx.profile_ab, rx.level, rx.bitrate, rx.options, rx.decoder_options, rx.sockopt)
+
+
+def _create_from_rx_decoded_rm_depth_longthrow(rx):
+    return rx_decoded_rm_depth_longthrow(rx.host, rx.port, rx.mode, rx.divisor, rx.png_filter, rx.sockopt)
+
+
+def _create_from_rx_decoded_pv(rx):
+    return rx_decoded_pv(rx.host, rx.port, rx.mode, rx.width, rx.height, rx.framerate, rx.divisor, rx.profile, rx.level, rx.bitrate, rx.options, rx.format, rx.decoder_options, rx.sockopt)
+
+
+def _create_from_rx_decoded_microphone(rx):
+    return rx_decoded_microphone(rx.host, rx.port, rx.profile, rx.level, rx.sockopt)
+
+
+def _create_from_rx_decoded_extended_audio(rx):
+    return rx_decoded_extended_audio(rx.host, rx.port, rx.mixer_mode, rx.loopback_gain, rx.microphone_gain, rx.profile, rx.level, rx.sockopt)
+
+
+_create_from_rx_table = {
+    hl2ss.rx_rm_vlc                     : _create_from_rx_rm_vlc,
+    hl2ss.rx_rm_depth_ahat              : _create_from_rx_rm_depth_ahat,
+    hl2ss.rx_rm_depth_longthrow         : _create_from_rx_rm_depth_longthrow,
+    hl2ss.rx_rm_imu                     : _create_from_rx_rm_imu,
+    hl2ss.rx_pv                         : _create_from_rx_pv,
+    hl2ss.rx_microphone                 : _create_from_rx_microphone,
+    hl2ss.rx_si                         : _create_from_rx_si,
+    hl2ss.rx_eet                        : _create_from_rx_eet,
+    hl2ss.rx_extended_audio             : _create_from_rx_extended_audio,
+    hl2ss.rx_decoded_rm_vlc             : _create_from_rx_decoded_rm_vlc,
+    hl2ss.rx_decoded_rm_depth_ahat      : _create_from_rx_decoded_rm_depth_ahat,
+    hl2ss.rx_decoded_rm_depth_longthrow : _create_from_rx_decoded_rm_depth_longthrow,
+    hl2ss.rx_decoded_pv                 : _create_from_rx_decoded_pv,
+    hl2ss.rx_decoded_microphone         : _create_from_rx_decoded_microphone,
+    hl2ss.rx_decoded_extended_audio     : _create_from_rx_decoded_extended_audio,
+}
+
+
+# Creates the asyncio counterpart of a blocking receiver (e.g. from hl2ss_lnm)
+def create_from_rx(rx):
+    return _create_from_rx_table[type(rx)](rx)
+
+
+#------------------------------------------------------------------------------
+# IPC
+#------------------------------------------------------------------------------
+
+# IPC clients (ipc_rc, ipc_sm, ipc_su, ipc_vi, ipc_umq) issue short
+# request/response exchanges so they are run unchanged in a dedicated thread
+# Calls to the same client are serialized
+class ipc:
+    def __init__(self, client):
+        self.client = client
+
+    async def open(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        await self.call(self.client.open)
+
+    async def call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def __getattr__(self, name):
+        function = getattr(self.client, name)
+        async def method(*args):
+            return await self.call(function, *args)
+        return method
+
+    async def close(self):
+        await self.call(self.client.close)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
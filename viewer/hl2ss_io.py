@@ -1,28 +1,151 @@
 
+import os
+import mmap
+import collections
+import concurrent.futures
 import struct
 import types
+import numpy as np
 import hl2ss
 
 
 _MAGIC = 'HL2SSV23'
 
+_INDEX_MAGIC     = 'HL2SSI01'
+_INDEX_EXTENSION = '.idx'
+_INDEX_DTYPE     = np.dtype([('timestamp', '<u8'), ('offset', '<u8'), ('size', '<u4'), ('keyframe', '<u4')])
+
+
+#------------------------------------------------------------------------------
+# Keyframe Detection
+#------------------------------------------------------------------------------
+
+def _h26x_is_keyframe(profile, data):
+    data = data if (hasattr(data, 'find')) else bytes(data)
+    h265 = profile == hl2ss.VideoProfile.H265_MAIN
+    start = data.find(b'\x00\x00\x01')
+    while ((start >= 0) and ((start + 3) < len(data))):
+        header = data[start + 3]
+        if (h265):
+            nal_type = (header >> 1) & 0x3F
+            if (nal_type < 32):
+                return (nal_type >= 16) and (nal_type <= 23)
+        else:
+            nal_type = header & 0x1F
+            if ((nal_type >= 1) and (nal_type <= 5)):
+                return nal_type == 5
+        start = data.find(b'\x00\x00\x01', start + 3)
+    return False
+
+
+class _keyframe_any:
+    def is_keyframe(self, payload):
+        return True
+
+
+class _keyframe_h26x:
+    def __init__(self, profile):
+        self.profile = profile
+
+    def is_keyframe(self, payload):
+        return _h26x_is_keyframe(self.profile, payload)
+
+
+class _keyframe_zdepth:
+    def __init__(self, profile):
+        self._ab = _create_keyframe_detector_video(profile)
+
+    def is_keyframe(self, payload):
+        size_z, size_ab = struct.unpack_from('<II', payload, 0)
+        return self._ab.is_keyframe(payload[(8 + size_z):(8 + size_z + size_ab)])
+
+
+def _create_keyframe_detector_video(profile):
+    return _keyframe_any() if (profile == hl2ss.VideoProfile.RAW) else _keyframe_h26x(profile)
+
+
+def _create_keyframe_detector_rm_depth_ahat(profile_z, profile_ab):
+    return _create_keyframe_detector_video(profile_ab) if (profile_z == hl2ss.DepthProfile.SAME) else _keyframe_zdepth(profile_ab)
+
+
+#------------------------------------------------------------------------------
+# Index
+#------------------------------------------------------------------------------
+
+def _index_filename(filename):
+    return filename + _INDEX_EXTENSION
+
+
+def _create_index_header():
+    return struct.pack(f'<{len(_INDEX_MAGIC)}s', _INDEX_MAGIC.encode())
+
+
+class _index_writer:
+    def open(self, filename):
+        self._file = open(_index_filename(filename), 'wb')
+        self._file.write(_create_index_header())
+
+    def append(self, timestamp, offset, size, keyframe):
+        self._file.write(struct.pack('<QQII', timestamp, offset, size, keyframe))
+
+    def close(self):
+        self._file.close()
+
+
+def _load_index(filename):
+    try:
+        with open(_index_filename(filename), 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    header = _create_index_header()
+    if (data[:len(header)] != header):
+        return None
+    count = (len(data) - len(header)) // _INDEX_DTYPE.itemsize
+    return np.frombuffer(data, dtype=_INDEX_DTYPE, count=count, offset=len(header)).copy()
+
+
+def _check_index(index):
+    return np.array_equal(index['offset'][1:], index['offset'][:-1] + index['size'][:-1]) and bool(np.all(index['timestamp'][1:] >= index['timestamp'][:-1]))
+
+
+def _save_index(filename, index):
+    temporary = f'{_index_filename(filename)}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(_create_index_header())
+            file.write(index.tobytes())
+        os.replace(temporary, _index_filename(filename))
+    except OSError:
+        # Read-only location, keep the index in memory only
+        if (os.path.exists(temporary)):
+            os.remove(temporary)
+
 
 #------------------------------------------------------------------------------
 # File Writer
 #------------------------------------------------------------------------------
 
 class _writer:
-    def open(self, filename):
+    def open(self, filename, keyframe):
         self._file = open(filename, 'wb')
+        self._index = _index_writer()
+        self._index.open(filename)
+        self._keyframe = keyframe
+        self._offset = 0
 
     def put(self, data):
         self._file.write(data)
+        self._offset += len(data)
 
     def write(self, packet):
-        self._file.write(hl2ss.pack_packet(packet))
+        data = hl2ss.pack_packet(packet)
+        self._index.append(packet.timestamp, self._offset, len(data), self._keyframe.is_keyframe(packet.payload))
+        self.put(data)
 
     def close(self):
         self._file.close()
+        self._index.close()
 
 
 #------------------------------------------------------------------------------
@@ -39,7 +162,7 @@ def _create_header(port, user):
 
 def _create_wr_rm_vlc(filename, port, mode, divisor, profile, level, bitrate, options, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _create_keyframe_detector_video(profile))
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_rm_vlc(mode, divisor, profile, level, bitrate, options))
     return w
@@ -47,7 +170,7 @@ def _create_wr_rm_vlc(filename, port, mode, divisor, profile, level, bitrate, op
 
 def _create_wr_rm_depth_ahat(filename, port, mode, divisor, profile_z, profile_ab, level, bitrate, options, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _create_keyframe_detector_rm_depth_ahat(profile_z, profile_ab))
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_rm_depth_ahat(mode, divisor, profile_z, profile_ab, level, bitrate, options))
     return w
@@ -55,7 +178,7 @@ def _create_wr_rm_depth_ahat(filename, port, mode, divisor, profile_z, profile_a
 
 def _create_wr_rm_depth_longthrow(filename, port, mode, divisor, png_filter, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_rm_depth_longthrow(mode, divisor, png_filter))
     return w
@@ -63,7 +186,7 @@ def _create_wr_rm_depth_longthrow(filename, port, mode, divisor, png_filter, use
 
 def _create_wr_rm_imu(filename, port, mode, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_rm_imu(mode))
     return w
@@ -71,7 +194,7 @@ def _create_wr_rm_imu(filename, port, mode, user):
 
 def _create_wr_pv(filename, port, mode, width, height, framerate, divisor, profile, level, bitrate, options, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _create_keyframe_detector_video(profile))
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_pv(mode, width, height, framerate, divisor, profile, level, bitrate, options))
     return w
@@ -79,7 +202,7 @@ def _create_wr_pv(filename, port, mode, width, height, framerate, divisor, profi
 
 def _create_wr_microphone(filename, port, profile, level, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_microphone(profile, level))
     return w
@@ -87,14 +210,14 @@ def _create_wr_microphone(filename, port, profile, level, user):
 
 def _create_wr_si(filename, port, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     return w
 
 
 def _create_wr_eet(filename, port, fps, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_eet(fps))
     return w
@@ -102,7 +225,7 @@ def _create_wr_eet(filename, port, fps, user):
 
 def _create_wr_extended_audio(filename, port, mixer_mode, loopback_gain, microphone_gain, profile, level, user):
     w = _writer()
-    w.open(filename)
+    w.open(filename, _keyframe_any())
     w.put(_create_header(port, user))
     w.put(hl2ss._create_configuration_for_extended_audio(mixer_mode, loopback_gain, microphone_gain, profile, level))
     return w
@@ -369,12 +492,27 @@ class _reader:
     def open(self, filename, chunk):
         self._file = open(filename, 'rb')
         self._chunk = chunk
+
+    def read(self, size):
+        return self._file.read(size)
+
+    def skip(self, size):
+        self._file.seek(size, os.SEEK_CUR)
+
+    def tell(self):
+        return self._file.tell()
+
+    def _move(self, offset):
+        self._file.seek(offset)
+
+    def _get_file_size(self):
+        return os.fstat(self._file.fileno()).st_size
         
     def get(self, format):
-        return struct.unpack(format, self._file.read(struct.calcsize(format)))
+        return struct.unpack(format, self.read(struct.calcsize(format)))
     
     def get_header(self):
-        return self.get(f'<{len(_MAGIC)}sH') + (self._file.read(self.get('<I')[0]),)
+        return self.get(f'<{len(_MAGIC)}sH') + (bytes(self.read(self.get('<I')[0])),)
     
     def get_configuration_for_mode(self):
         return self.get('<B')
@@ -430,9 +568,66 @@ class _reader:
         return self.get_configuration_for_mrc_audio() + self.get_configuration_for_audio_encoding()
 
     def begin(self, mode):
+        self._mode = mode
+        self._data_offset = self.tell()
         self._unpacker = hl2ss._unpacker()
         self._unpacker.reset(mode)
         self._eof = False
+
+    def seek(self, offset):
+        self._move(offset)
+        self._unpacker.reset(self._mode)
+        self._eof = False
+
+    def _get_pose_size(self):
+        return 64 if (self._mode == hl2ss.StreamMode.MODE_1) else 0
+
+    def _check(self, entry):
+        self._move(int(entry['offset']))
+        header = self.read(12)
+        return (len(header) == 12) and (struct.unpack('<QI', header) == (int(entry['timestamp']), int(entry['size']) - 12 - self._get_pose_size()))
+
+    def _scan(self, offset, keyframe):
+        pose_size = self._get_pose_size()
+        size = self._get_file_size()
+        skip = isinstance(keyframe, _keyframe_any)
+        entries = []
+        self._move(offset)
+        while ((offset + 12) <= size):
+            timestamp, payload_size = self.get('<QI')
+            packet_size = 12 + payload_size + pose_size
+            if ((offset + packet_size) > size):
+                break
+            if (skip):
+                self.skip(payload_size + pose_size)
+                key = True
+            else:
+                key = keyframe.is_keyframe(self.read(payload_size))
+                self.skip(pose_size)
+            entries.append((timestamp, offset, packet_size, key))
+            offset += packet_size
+        return np.array(entries, dtype=_INDEX_DTYPE)
+
+    def get_index(self, filename, keyframe):
+        index = _load_index(filename)
+        if (index is not None):
+            index = index[(index['offset'] + index['size']) <= self._get_file_size()]
+            if ((len(index) > 0) and ((int(index[0]['offset']) != self._data_offset) or (not _check_index(index)) or (not self._check(index[0])) or (not self._check(index[-1])))):
+                index = None
+        save = index is None
+        if (save):
+            index = np.empty(0, dtype=_INDEX_DTYPE)
+        tail = self._scan(self.get_end_offset(index), keyframe)
+        if (len(tail) > 0):
+            index = np.concatenate((index, tail))
+            save = True
+        if (save):
+            _save_index(filename, index)
+        self.seek(self._data_offset)
+        return index
+
+    def get_end_offset(self, index):
+        return int(index[-1]['offset'] + index[-1]['size']) if (len(index) > 0) else self._data_offset
         
     def get_next_packet(self):
         while (True):
@@ -448,15 +643,73 @@ class _reader:
         self._file.close()
 
 
+class _reader_mapped(_reader):
+    def open(self, filename, chunk):
+        with open(filename, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._buffer)
+        self._size = len(self._buffer)
+        self._offset = 0
+
+    def read(self, size):
+        begin = self._offset
+        self._offset = min(begin + size, self._size)
+        return self._view[begin:self._offset]
+
+    def skip(self, size):
+        self._offset = min(self._offset + size, self._size)
+
+    def tell(self):
+        return self._offset
+
+    def _move(self, offset):
+        self._offset = offset
+
+    def _get_file_size(self):
+        return self._size
+
+    def get(self, format):
+        size = struct.calcsize(format)
+        data = struct.unpack_from(format, self._buffer, self._offset)
+        self._offset += size
+        return data
+
+    def get_next_packet(self):
+        offset = self._offset
+        if ((offset + 12) > self._size):
+            return None
+        timestamp, payload_size = struct.unpack_from('<QI', self._buffer, offset)
+        begin = offset + 12
+        end = begin + payload_size
+        pose_size = self._get_pose_size()
+        if ((end + pose_size) > self._size):
+            return None
+        self._offset = end + pose_size
+        pose = np.frombuffer(self._buffer, dtype=np.float32, count=16, offset=end).reshape((4, 4)) if (pose_size > 0) else None
+        return hl2ss._packet(timestamp, self._view[begin:end], pose)
+
+    def close(self):
+        self._view.release()
+        try:
+            self._buffer.close()
+        except BufferError:
+            # Packets still reference the mapping, it is unmapped when the last view is released
+            pass
+
+
 #------------------------------------------------------------------------------
 # Mode 0 and Mode 1 Data Load
 #------------------------------------------------------------------------------
 
-def _create_rd(filename, chunk):
-    rd = _reader()
+def _create_rd(filename, chunk, mapped):
+    rd = _reader_mapped() if (mapped) else _reader()
     rd.open(filename, chunk)
     return (rd,) + rd.get_header()
 
+def _gather(buffer, offsets, size):
+    return buffer[offsets.reshape((-1, 1)) + np.arange(size, dtype=np.uint64)]
+
+
 #------------------------------------------------------------------------------
 # Reader Wrapper
 #------------------------------------------------------------------------------
@@ -497,39 +750,110 @@ class _rd(hl2ss._context_manager):
         self.mixer_mode, self.loopback_gain, self.microphone_gain, self.profile, self.level = self._rd.get_configuration_for_extended_audio()
         self._rd.begin(hl2ss.StreamMode.MODE_0)
 
+    def __keyframe_video(self):
+        return _create_keyframe_detector_video(self.profile)
+
+    def __keyframe_rm_depth_ahat(self):
+        return _create_keyframe_detector_rm_depth_ahat(self.profile_z, self.profile_ab)
+
+    def __keyframe_any(self):
+        return _keyframe_any()
+
     __method_table = {
-        hl2ss.StreamPort.RM_VLC_LEFTFRONT     : (__load_rm_vlc,),
-        hl2ss.StreamPort.RM_VLC_LEFTLEFT      : (__load_rm_vlc,),
-        hl2ss.StreamPort.RM_VLC_RIGHTFRONT    : (__load_rm_vlc,),
-        hl2ss.StreamPort.RM_VLC_RIGHTRIGHT    : (__load_rm_vlc,),
-        hl2ss.StreamPort.RM_DEPTH_AHAT        : (__load_rm_depth_ahat,),
-        hl2ss.StreamPort.RM_DEPTH_LONGTHROW   : (__load_rm_depth_longthrow,),
-        hl2ss.StreamPort.RM_IMU_ACCELEROMETER : (__load_rm_imu,),
-        hl2ss.StreamPort.RM_IMU_GYROSCOPE     : (__load_rm_imu,),
-        hl2ss.StreamPort.RM_IMU_MAGNETOMETER  : (__load_rm_imu,),
-        hl2ss.StreamPort.PERSONAL_VIDEO       : (__load_pv,),
-        hl2ss.StreamPort.MICROPHONE           : (__load_microphone,),
-        hl2ss.StreamPort.SPATIAL_INPUT        : (__load_si,),
-        hl2ss.StreamPort.EXTENDED_EYE_TRACKER : (__load_eet,),
-        hl2ss.StreamPort.EXTENDED_AUDIO       : (__load_extended_audio,),
+        hl2ss.StreamPort.RM_VLC_LEFTFRONT     : (__load_rm_vlc,             __keyframe_video),
+        hl2ss.StreamPort.RM_VLC_LEFTLEFT      : (__load_rm_vlc,             __keyframe_video),
+        hl2ss.StreamPort.RM_VLC_RIGHTFRONT    : (__load_rm_vlc,             __keyframe_video),
+        hl2ss.StreamPort.RM_VLC_RIGHTRIGHT    : (__load_rm_vlc,             __keyframe_video),
+        hl2ss.StreamPort.RM_DEPTH_AHAT        : (__load_rm_depth_ahat,      __keyframe_rm_depth_ahat),
+        hl2ss.StreamPort.RM_DEPTH_LONGTHROW   : (__load_rm_depth_longthrow, __keyframe_any),
+        hl2ss.StreamPort.RM_IMU_ACCELEROMETER : (__load_rm_imu,             __keyframe_any),
+        hl2ss.StreamPort.RM_IMU_GYROSCOPE     : (__load_rm_imu,             __keyframe_any),
+        hl2ss.StreamPort.RM_IMU_MAGNETOMETER  : (__load_rm_imu,             __keyframe_any),
+        hl2ss.StreamPort.PERSONAL_VIDEO       : (__load_pv,                 __keyframe_video),
+        hl2ss.StreamPort.MICROPHONE           : (__load_microphone,         __keyframe_any),
+        hl2ss.StreamPort.SPATIAL_INPUT        : (__load_si,                 __keyframe_any),
+        hl2ss.StreamPort.EXTENDED_EYE_TRACKER : (__load_eet,                __keyframe_any),
+        hl2ss.StreamPort.EXTENDED_AUDIO       : (__load_extended_audio,     __keyframe_any),
     }
 
     def __build(self):
         f = _rd.__method_table[self.port]
-        self.__load = types.MethodType(f[0], self)
+        self.__load     = types.MethodType(f[0], self)
+        self.__keyframe = types.MethodType(f[1], self)
         
-    def __init__(self, filename, chunk):
+    def __init__(self, filename, chunk, mapped):
         self.filename = filename
         self.chunk = chunk
+        self.mapped = mapped
 
     def open(self):
-        self._rd, self.magic, self.port, self.user = _create_rd(self.filename, self.chunk)
+        self._rd, self.magic, self.port, self.user = _create_rd(self.filename, self.chunk, self.mapped)
         self.__build()
         self.__load()
+        self.index = self._rd.get_index(self.filename, self.__keyframe())
+        self._keyframes = np.flatnonzero(self.index['keyframe'])
         
     def get_next_packet(self):
         return self._rd.get_next_packet()
 
+    def get_index(self):
+        return self.index
+
+    def get_frame_count(self):
+        return len(self.index)
+
+    def get_frame(self, timestamp):
+        return int(np.searchsorted(self.index['timestamp'], timestamp, side='left'))
+
+    def get_keyframe(self, frame):
+        i = int(np.searchsorted(self._keyframes, frame, side='right')) - 1
+        return int(self._keyframes[i]) if (i >= 0) else 0
+
+    def seek_frame(self, frame):
+        self._rd.seek(int(self.index[frame]['offset']) if (frame < len(self.index)) else self._rd.get_end_offset(self.index))
+
+    def seek(self, timestamp):
+        frame = self.get_frame(timestamp)
+        self.seek_frame(frame)
+        return frame
+
+    def get_packet(self, frame):
+        self.seek_frame(frame)
+        return self.get_next_packet()
+
+    def _get_buffer(self):
+        return np.memmap(self.filename, dtype=np.uint8, mode='r')
+
+    def _get_payload_offsets(self):
+        return self.index['offset'] + 12
+
+    def get_payload_sizes(self):
+        return self.index['size'].astype(np.int64) - 12 - self._rd._get_pose_size()
+
+    def get_poses(self):
+        if ((self._rd._get_pose_size() <= 0) or (len(self.index) <= 0)):
+            return None
+        offsets = self.index['offset'] + self.index['size'] - 64
+        return _gather(self._get_buffer(), offsets, 64).view(np.float32).reshape((-1, 4, 4))
+
+    def get_payload_tails(self, size):
+        return _gather(self._get_buffer(), self._get_payload_offsets() + self.get_payload_sizes().astype(np.uint64) - size, size)
+
+    def get_payloads(self):
+        buffer = self._get_buffer()
+        return np.concatenate([buffer[offset:(offset + size)] for offset, size in zip(self._get_payload_offsets().tolist(), self.get_payload_sizes().tolist())] + [np.empty(0, dtype=np.uint8)])
+
+    def get_payload_array(self, dtype):
+        sizes = self.get_payload_sizes()
+        if ((len(sizes) <= 0) or np.any(sizes != sizes[0]) or ((int(sizes[0]) % dtype.itemsize) != 0)):
+            return None
+        fields = [('timestamp', '<u8'), ('size', '<u4'), ('payload', dtype, (int(sizes[0]) // dtype.itemsize,))]
+        pose_size = self._rd._get_pose_size()
+        if (pose_size > 0):
+            fields.append(('pose', '<f4', (4, 4)))
+        packets = np.frombuffer(self._get_buffer(), dtype=np.dtype(fields), count=len(sizes), offset=int(self.index[0]['offset']))
+        return packets['payload']
+
     def close(self):
         self._rd.close()
 
@@ -540,28 +864,32 @@ class _rd(hl2ss._context_manager):
 
 class _rd_decoded(_rd):
     def __set_codec_rm_vlc(self):
-        self._codec = hl2ss.decode_rm_vlc(self.profile)
+        self._codec = hl2ss.decode_rm_vlc(self.profile, self.decoder_options)
+        self.latency = 1
 
     def __set_codec_rm_depth_ahat(self):
-        self._codec = hl2ss.decode_rm_depth_ahat(self.profile_z, self.profile_ab)
+        self._codec = hl2ss.decode_rm_depth_ahat(self.profile_z, self.profile_ab, self.decoder_options)
+        self.latency = 1
 
     def __set_codec_rm_depth_longthrow(self):
-        pass
+        self.latency = 0
 
     def __set_codec_rm_imu(self):
-        pass
+        self.latency = 0
 
     def __set_codec_pv(self):
-        self._codec = hl2ss.decode_pv(self.profile)
+        self._codec = hl2ss.decode_pv(self.profile, self.decoder_options)
+        self.latency = 1
 
     def __set_codec_microphone(self):
         self._codec = hl2ss.decode_microphone(self.profile)
+        self.latency = 0
 
     def __set_codec_si(self):
-        pass
+        self.latency = 0
 
     def __set_codec_eet(self):
-        pass
+        self.latency = 0
 
     def __create_codec_rm_vlc(self):
         self._codec.create()
@@ -639,9 +967,10 @@ class _rd_decoded(_rd):
         self.__create_codec = types.MethodType(f[1], self)
         self.__decode       = types.MethodType(f[2], self)
 
-    def __init__(self, filename, chunk, format):
-        super().__init__(filename, chunk)
+    def __init__(self, filename, chunk, format, decoder_options, mapped):
+        super().__init__(filename, chunk, mapped)
         self.format = format
+        self.decoder_options = decoder_options
 
     def open(self):
         super().open()
@@ -655,6 +984,13 @@ class _rd_decoded(_rd):
             data.payload = self.__decode(data.payload)
         return data
 
+    def seek_frame(self, frame):
+        start = self.get_keyframe(frame - self.latency) if (frame < self.get_frame_count()) else frame
+        super().seek_frame(start)
+        self.__create_codec()
+        for _ in range(start + self.latency, frame):
+            self.get_next_packet()
+
     def close(self):
         super().close()
 
@@ -663,8 +999,60 @@ class _rd_decoded(_rd):
 # Create Reader
 #------------------------------------------------------------------------------
 
-def create_rd(filename, chunk, decoded):
-    return _rd_decoded(filename, chunk, decoded) if (decoded) else _rd(filename, chunk)
+def create_rd(filename, chunk, decoded, decoder_options=None, mapped=False):
+    if (decoder_options is None):
+        decoder_options = dict()
+    return _rd_decoded(filename, chunk, decoded, decoder_options, mapped) if (decoded) else _rd(filename, chunk, mapped)
+
+
+#------------------------------------------------------------------------------
+# Parallel Decoder
+#------------------------------------------------------------------------------
+
+def _get_decode_ranges(rd, frames_per_task):
+    count = rd.get_frame_count()
+    starts = np.unique(np.clip(rd._keyframes + rd.latency, 0, count))
+    ranges = []
+    begin = 0
+    for start in starts.tolist():
+        if ((start - begin) >= frames_per_task):
+            ranges.append((begin, start))
+            begin = start
+    if (begin < count):
+        ranges.append((begin, count))
+    return ranges
+
+
+def _decode_range(filename, chunk, format, decoder_options, begin, end):
+    rd = _rd_decoded(filename, chunk, format, decoder_options, False)
+    rd.open()
+    rd.seek_frame(begin)
+    packets = [rd.get_next_packet() for _ in range(end - max(begin, rd.latency))]
+    rd.close()
+    return packets
+
+
+def decode_parallel(filename, chunk, format, decoder_options=None, max_workers=None, frames_per_task=None):
+    if (decoder_options is None):
+        decoder_options = dict()
+    if (max_workers is None):
+        max_workers = os.cpu_count() or 1
+
+    rd = _rd_decoded(filename, chunk, format, decoder_options, False)
+    rd.open()
+    if (frames_per_task is None):
+        frames_per_task = max(rd.get_frame_count() // (max_workers * 4), 1)
+    ranges = _get_decode_ranges(rd, frames_per_task)
+    rd.close()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        pending = collections.deque()
+        for begin, end in ranges:
+            pending.append(executor.submit(_decode_range, filename, chunk, format, decoder_options, begin, end))
+            if (len(pending) >= (2 * max_workers)):
+                yield from pending.popleft().result()
+        while (len(pending) > 0):
+            yield from pending.popleft().result()
 
 
 #------------------------------------------------------------------------------
@@ -672,25 +1060,43 @@ def create_rd(filename, chunk, decoded):
 #------------------------------------------------------------------------------
 
 class sequencer:
-    def __init__(self, filename, chunk, decoded):
+    def __init__(self, filename, chunk, decoded, decoder_options=None, mapped=False):
         self.filename = filename
         self.chunk = chunk
         self.decoded = decoded
+        self.decoder_options = decoder_options
+        self.mapped = mapped
 
     def open(self):
-        self._rd = create_rd(self.filename, self.chunk, self.decoded)
+        self._rd = create_rd(self.filename, self.chunk, self.decoded, self.decoder_options, self.mapped)
         self._rd.open()
         self._l = self._rd.get_next_packet()
         self._r = self._rd.get_next_packet()
+        self._frame = self._rd.get_frame(self._r.timestamp) if (self._r is not None) else 0
+
+    def _jump(self, timestamp):
+        frame = self._rd.get_frame(timestamp) - 1
+        if (frame <= self._frame):
+            return
+        if (self.decoded and (self._rd.get_keyframe(frame - self._rd.latency) <= self._frame)):
+            return
+        self._rd.seek_frame(frame)
+        self._l = self._rd.get_next_packet()
+        self._r = self._rd.get_next_packet()
+        self._frame = frame + 1
 
     def get_next_packet(self, timestamp):
         if ((self._l is None) or (self._r is None)):
             return None
         if (timestamp < self._l.timestamp):
             return None
+        self._jump(timestamp)
+        if (self._r is None):
+            return None
         while (timestamp > self._r.timestamp):
             self._l = self._r
             self._r = self._rd.get_next_packet()
+            self._frame += 1
             if (self._r is None):
                 return None
         return self._l if ((timestamp - self._l.timestamp) < (self._r.timestamp - timestamp)) else self._r
@@ -1,4 +1,7 @@
 
+import socket
+import time
+import concurrent.futures
 import hl2ss
 
 
@@ -29,6 +32,36 @@ def get_video_codec_default_options(width, height, framerate, divisor, profile):
     return options
 
 
+def get_video_decoder_options(thread_type=None, thread_count=None, skip_frame=None, low_delay=None):
+    options = dict()
+    if (thread_type is not None):
+        options['thread_type'] = thread_type
+    if (thread_count is not None):
+        options['threads'] = thread_count
+    if (skip_frame is not None):
+        options['skip_frame'] = skip_frame
+    if (low_delay is not None):
+        options['flags'] = '+low_delay' if (low_delay) else '-low_delay'
+    return options
+
+
+def get_video_decoder_default_options():
+    return get_video_decoder_options()
+
+
+def get_socket_options(rcvbuf=None, nodelay=None):
+    sockopt = dict()
+    if (rcvbuf is not None):
+        sockopt[(socket.SOL_SOCKET, socket.SO_RCVBUF)] = rcvbuf
+    if (nodelay is not None):
+        sockopt[(socket.IPPROTO_TCP, socket.TCP_NODELAY)] = 1 if (nodelay) else 0
+    return sockopt
+
+
+def get_socket_default_options():
+    return get_socket_options()
+
+
 #------------------------------------------------------------------------------
 # Stream Sync Period
 #------------------------------------------------------------------------------
@@ -84,58 +117,94 @@ def stop_subsystem_pv(host, port):
 # Modes 0, 1
 #------------------------------------------------------------------------------
 
-def rx_rm_vlc(host, port, chunk=hl2ss.ChunkSize.RM_VLC, mode=hl2ss.StreamMode.MODE_1, divisor=1, profile=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded=True):
+def rx_rm_vlc(host, port, chunk=hl2ss.ChunkSize.RM_VLC, mode=hl2ss.StreamMode.MODE_1, divisor=1, profile=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded=True, decoder_options=None, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
+
+    if (decoder_options is None):
+        decoder_options = get_video_decoder_default_options()
+
     if (bitrate is None):
         bitrate = get_video_codec_default_bitrate(hl2ss.Parameters_RM_VLC.WIDTH, hl2ss.Parameters_RM_VLC.HEIGHT, hl2ss.Parameters_RM_VLC.FPS, divisor, profile)
 
     if (options is None):
         options = get_video_codec_default_options(hl2ss.Parameters_RM_VLC.WIDTH, hl2ss.Parameters_RM_VLC.HEIGHT, hl2ss.Parameters_RM_VLC.FPS, divisor, profile)
     
-    return hl2ss.rx_decoded_rm_vlc(host, port, chunk, mode, divisor, profile, level, bitrate, options) if (decoded) else hl2ss.rx_rm_vlc(host, port, chunk, mode, divisor, profile, level, bitrate, options)
+    return hl2ss.rx_decoded_rm_vlc(host, port, chunk, mode, divisor, profile, level, bitrate, options, decoder_options, gatherer, sockopt) if (decoded) else hl2ss.rx_rm_vlc(host, port, chunk, mode, divisor, profile, level, bitrate, options, gatherer, sockopt)
 
 
-def rx_rm_depth_ahat(host, port, chunk=hl2ss.ChunkSize.RM_DEPTH_AHAT, mode=hl2ss.StreamMode.MODE_1, divisor=1, profile_z=hl2ss.DepthProfile.SAME, profile_ab=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded=True):
+def rx_rm_depth_ahat(host, port, chunk=hl2ss.ChunkSize.RM_DEPTH_AHAT, mode=hl2ss.StreamMode.MODE_1, divisor=1, profile_z=hl2ss.DepthProfile.SAME, profile_ab=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded=True, decoder_options=None, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
+
+    if (decoder_options is None):
+        decoder_options = get_video_decoder_default_options()
+
     if (bitrate is None):
         bitrate = get_video_codec_default_bitrate(hl2ss.Parameters_RM_DEPTH_AHAT.WIDTH, hl2ss.Parameters_RM_DEPTH_AHAT.HEIGHT, hl2ss.Parameters_RM_DEPTH_AHAT.FPS, divisor, profile_ab) * (4 if ((profile_z == hl2ss.DepthProfile.SAME) and (profile_ab != hl2ss.VideoProfile.RAW)) else 1)
 
     if (options is None):
         options = get_video_codec_default_options(hl2ss.Parameters_RM_VLC.WIDTH, hl2ss.Parameters_RM_VLC.HEIGHT, hl2ss.Parameters_RM_VLC.FPS, divisor, profile_ab)
     
-    return hl2ss.rx_decoded_rm_depth_ahat(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options) if (decoded) else hl2ss.rx_rm_depth_ahat(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options)
+    return hl2ss.rx_decoded_rm_depth_ahat(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options, decoder_options, gatherer, sockopt) if (decoded) else hl2ss.rx_rm_depth_ahat(host, port, chunk, mode, divisor, profile_z, profile_ab, level, bitrate, options, gatherer, sockopt)
+
+
+def rx_rm_depth_longthrow(host, port, chunk=hl2ss.ChunkSize.RM_DEPTH_LONGTHROW, mode=hl2ss.StreamMode.MODE_1, divisor=1, png_filter=hl2ss.PNGFilterMode.PAETH, decoded=True, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
 
+    return hl2ss.rx_decoded_rm_depth_longthrow(host, port, chunk, mode, divisor, png_filter, gatherer, sockopt) if (decoded) else hl2ss.rx_rm_depth_longthrow(host, port, chunk, mode, divisor, png_filter, gatherer, sockopt)
 
-def rx_rm_depth_longthrow(host, port, chunk=hl2ss.ChunkSize.RM_DEPTH_LONGTHROW, mode=hl2ss.StreamMode.MODE_1, divisor=1, png_filter=hl2ss.PNGFilterMode.PAETH, decoded=True):
-    return hl2ss.rx_decoded_rm_depth_longthrow(host, port, chunk, mode, divisor, png_filter) if (decoded) else hl2ss.rx_rm_depth_longthrow(host, port, chunk, mode, divisor, png_filter)
 
+def rx_rm_imu(host, port, chunk=hl2ss.ChunkSize.RM_IMU, mode=hl2ss.StreamMode.MODE_1, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
 
-def rx_rm_imu(host, port, chunk=hl2ss.ChunkSize.RM_IMU, mode=hl2ss.StreamMode.MODE_1):
-    return hl2ss.rx_rm_imu(host, port, chunk, mode)
+    return hl2ss.rx_rm_imu(host, port, chunk, mode, gatherer, sockopt)
 
 
-def rx_pv(host, port, chunk=hl2ss.ChunkSize.PERSONAL_VIDEO, mode=hl2ss.StreamMode.MODE_1, width=1920, height=1080, framerate=30, divisor=1, profile=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded_format='bgr24'):
+def rx_pv(host, port, chunk=hl2ss.ChunkSize.PERSONAL_VIDEO, mode=hl2ss.StreamMode.MODE_1, width=1920, height=1080, framerate=30, divisor=1, profile=hl2ss.VideoProfile.H265_MAIN, level=hl2ss.H26xLevel.DEFAULT, bitrate=None, options=None, decoded_format='bgr24', decoder_options=None, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
+
+    if (decoder_options is None):
+        decoder_options = get_video_decoder_default_options()
+
     if (bitrate is None):
         bitrate = get_video_codec_default_bitrate(width, height, framerate, divisor, profile)
 
     if (options is None):
         options = get_video_codec_default_options(width, height, framerate, divisor, profile)
     
-    return hl2ss.rx_decoded_pv(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, decoded_format) if (decoded_format) else hl2ss.rx_pv(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options)
+    return hl2ss.rx_decoded_pv(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, decoded_format, decoder_options, gatherer, sockopt) if (decoded_format) else hl2ss.rx_pv(host, port, chunk, mode, width, height, framerate, divisor, profile, level, bitrate, options, gatherer, sockopt)
+
+
+def rx_microphone(host, port, chunk=hl2ss.ChunkSize.MICROPHONE, profile=hl2ss.AudioProfile.AAC_24000, level=hl2ss.AACLevel.L2, decoded=True, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
 
+    return hl2ss.rx_decoded_microphone(host, port, chunk, profile, level, gatherer, sockopt) if (decoded) else hl2ss.rx_microphone(host, port, chunk, profile, level, gatherer, sockopt)
 
-def rx_microphone(host, port, chunk=hl2ss.ChunkSize.MICROPHONE, profile=hl2ss.AudioProfile.AAC_24000, level=hl2ss.AACLevel.L2, decoded=True):
-    return hl2ss.rx_decoded_microphone(host, port, chunk, profile, level) if (decoded) else hl2ss.rx_microphone(host, port, chunk, profile, level)
 
+def rx_si(host, port, chunk=hl2ss.ChunkSize.SPATIAL_INPUT, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
 
-def rx_si(host, port, chunk=hl2ss.ChunkSize.SPATIAL_INPUT):
-    return hl2ss.rx_si(host, port, chunk)
+    return hl2ss.rx_si(host, port, chunk, gatherer, sockopt)
 
 
-def rx_eet(host, port, chunk=hl2ss.ChunkSize.EXTENDED_EYE_TRACKER, fps=30):
-    return hl2ss.rx_eet(host, port, chunk, fps)
+def rx_eet(host, port, chunk=hl2ss.ChunkSize.EXTENDED_EYE_TRACKER, fps=30, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
 
+    return hl2ss.rx_eet(host, port, chunk, fps, gatherer, sockopt)
 
-def rx_extended_audio(host, port, chunk=hl2ss.ChunkSize.EXTENDED_AUDIO, mixer_mode=hl2ss.MixerMode.BOTH, loopback_gain=1.0, microphone_gain=1.0, profile=hl2ss.AudioProfile.AAC_24000, level=hl2ss.AACLevel.L2, decoded=True):
-    return hl2ss.rx_decoded_extended_audio(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level) if (decoded) else hl2ss.rx_extended_audio(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level)
+
+def rx_extended_audio(host, port, chunk=hl2ss.ChunkSize.EXTENDED_AUDIO, mixer_mode=hl2ss.MixerMode.BOTH, loopback_gain=1.0, microphone_gain=1.0, profile=hl2ss.AudioProfile.AAC_24000, level=hl2ss.AACLevel.L2, decoded=True, gatherer=hl2ss.GathererMode.COPY, sockopt=None):
+    if (sockopt is None):
+        sockopt = get_socket_default_options()
+
+    return hl2ss.rx_decoded_extended_audio(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer, sockopt) if (decoded) else hl2ss.rx_extended_audio(host, port, chunk, mixer_mode, loopback_gain, microphone_gain, profile, level, gatherer, sockopt)
 
 
 #------------------------------------------------------------------------------
@@ -162,6 +231,48 @@ def download_calibration_pv(host, port, width, height, framerate):
     return hl2ss.download_calibration_pv(host, port, width, height, framerate)
 
 
+def download_calibration_rm(host, port):
+    if (port == hl2ss.StreamPort.RM_VLC_LEFTFRONT):
+        return download_calibration_rm_vlc(            host, port)
+    if (port == hl2ss.StreamPort.RM_VLC_LEFTLEFT):
+        return download_calibration_rm_vlc(            host, port)
+    if (port == hl2ss.StreamPort.RM_VLC_RIGHTFRONT):
+        return download_calibration_rm_vlc(            host, port)
+    if (port == hl2ss.StreamPort.RM_VLC_RIGHTRIGHT):
+        return download_calibration_rm_vlc(            host, port)
+    if (port == hl2ss.StreamPort.RM_DEPTH_AHAT):
+        return download_calibration_rm_depth_ahat(     host, port)
+    if (port == hl2ss.StreamPort.RM_DEPTH_LONGTHROW):
+        return download_calibration_rm_depth_longthrow(host, port)
+    if (port == hl2ss.StreamPort.RM_IMU_ACCELEROMETER):
+        return download_calibration_rm_imu(            host, port)
+    if (port == hl2ss.StreamPort.RM_IMU_GYROSCOPE):
+        return download_calibration_rm_imu(            host, port)
+
+    return None
+
+
+def _download_calibration_timed(host, port, width, height, framerate):
+    start = time.perf_counter()
+    calibration = download_calibration_pv(host, port, width, height, framerate) if (port == hl2ss.StreamPort.PERSONAL_VIDEO) else download_calibration_rm(host, port)
+    return (calibration, time.perf_counter() - start)
+
+
+def download_calibration_many(host, ports, pv_width=1920, pv_height=1080, pv_framerate=30, max_workers=None):
+    calibrations = dict()
+    elapsed = dict()
+
+    if (len(ports) <= 0):
+        return (calibrations, elapsed)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(ports) if (max_workers is None) else max_workers) as executor:
+        futures = {port : executor.submit(_download_calibration_timed, host, port, pv_width, pv_height, pv_framerate) for port in ports}
+        for port, future in futures.items():
+            calibrations[port], elapsed[port] = future.result()
+
+    return (calibrations, elapsed)
+
+
 #------------------------------------------------------------------------------
 # IPC
 #------------------------------------------------------------------------------
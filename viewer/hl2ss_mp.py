@@ -1,5 +1,13 @@
 
+import os
 import multiprocessing as mp
+import multiprocessing.connection
+import multiprocessing.resource_tracker
+import multiprocessing.shared_memory
+import pickle
+import struct
+import numpy as np
+import hl2ss
 
 
 #------------------------------------------------------------------------------
@@ -7,68 +15,274 @@ import multiprocessing as mp
 #------------------------------------------------------------------------------
 
 class _RingBuffer:
-    """Implements a ring-buffer with the different processing after it becomes full.
-    Idea: https://www.oreilly.com/library/view/python-cookbook/0596001673/ch05s19.html
+    """Implements a ring-buffer of packets with a parallel timestamp array.
+    Packets are indexed in chronological order (0 is the oldest).
     """
 
     def __init__(self, size_max = 64):
         self.max = size_max
-        self.data = []
+        self.data = [None] * size_max
+        self.timestamps = np.zeros(size_max, dtype=np.uint64)
+        self.cur = 0
+        self.count = 0
 
-    class __Full:
-        def append(self, x):
-            self.data[self.cur] = x
-            self.cur = (self.cur+1) % self.max
-
-        def get(self):
-            return self.data[self.cur:]+self.data[:self.cur]
-
-        def last(self):
-            return self.get()[-1]
+    def append(self, x):
+        self.data[self.cur] = x
+        self.timestamps[self.cur] = x.timestamp
+        self.cur = (self.cur + 1) % self.max
+        if (self.count < self.max):
+            self.count += 1
 
-        def length(self):
-            return self.max
+    def _index(self, index):
+        return (self.cur - self.count + index) % self.max
 
-    def append(self, x):
-        self.data.append(x)
-        if (len(self.data) == self.max):
-            self.cur = 0
-            self.__class__ = self.__Full
+    def at(self, index):
+        return self.data[self._index(index)]
 
     def get(self):
-        return self.data
+        start = self._index(0)
+        return self.data[start:(start + self.count)] + self.data[:max(start + self.count - self.max, 0)]
 
     def last(self):
-        if (len(self.data) == 0):
+        if (self.count <= 0):
             return None
-        return self.get()[-1]
+        return self.data[self.cur - 1]
 
     def length(self):
-        return len(self.data)
+        return self.count
+
+    def _search(self, timestamps):
+        n = self.count
+        start = self._index(0)
+        head = self.timestamps[start:(start + n)]
+        tail = self.timestamps[:max(start + n - self.max, 0)]
+        position = np.searchsorted(head, timestamps)
+        if (tail.size > 0):
+            wrap = timestamps >= tail[0]
+            position[wrap] = head.size + np.searchsorted(tail, timestamps[wrap])
+        l = np.clip(position - 1, 0, n - 1)
+        r = np.clip(position, 0, n - 1)
+        return (l, r, self.timestamps[(start + l) % self.max], self.timestamps[(start + r) % self.max])
+
+    def find_nearest_many(self, timestamps):
+        if (self.count <= 0):
+            return None
+        timestamps = np.asarray(timestamps, dtype=np.uint64)
+        l, r, tl, tr = self._search(timestamps)
+        dl = np.where(tl > timestamps, tl - timestamps, timestamps - tl)
+        dr = np.where(tr > timestamps, tr - timestamps, timestamps - tr)
+        return np.where(dl < dr, l, r)
+
+    def find_bracket_many(self, timestamps):
+        if (self.count <= 0):
+            return None
+        timestamps = np.asarray(timestamps, dtype=np.uint64)
+        l, r, tl, tr = self._search(timestamps)
+        l = np.where((tr == timestamps) | (tl > timestamps), r, l)
+        r = np.where(tr < timestamps, l, r)
+        return np.stack((l, r), axis=-1)
 
+    def find_nearest(self, timestamp):
+        index = self.find_nearest_many([timestamp])
+        return None if (index is None) else int(index[0])
 
-def _get_nearest_packet(data, timestamp):
-    n = len(data)
 
-    if (n <= 0):
-        return None
-    elif (n == 1):
-        return 0
+#------------------------------------------------------------------------------
+# Transport
+#------------------------------------------------------------------------------
+
+# Packet Transport Mode
+# 0: Packets are pickled through queues (source -> interconnect -> sink)
+# 1: Packets are written once to a shared memory slot ring by the source and
+#    only (timestamp, slot) handles go through the queues
+#    Slots are sized for the packets the receiver produces (encoded or
+#    decoded) and the ring is capped at segment_size bytes, packets that do
+#    not fit in a slot are sent through the queues
+#    Sinks copy the packet out of its slot, raw payloads (bytes) are received
+#    as bytearray
+#    Packets whose slot was reused by the source while or before reading (at
+#    least buffer_size / 2 frames after leaving the buffer) are reported as
+#    missing
+class TransportMode:
+    QUEUE = 0
+    SHARED_MEMORY = 1
+    SEGMENT_SIZE = 32 * 1024 * 1024
+
+
+class _shared_packet:
+    def __init__(self, timestamp, name, offset, frame_stamp, packet):
+        self.timestamp = timestamp
+        self.name = name
+        self.offset = offset
+        self.frame_stamp = frame_stamp
+        self.packet = packet
+
+
+def _align(size):
+    return (size + 63) & ~63
+
+
+class _queue_writer:
+    def open(self):
+        pass
+
+    def write(self, packet):
+        return packet
+
+    def close(self):
+        pass
+
+
+class _shared_writer:
+    SLOT_HEADER = 16
+
+    def __init__(self, slots, size, limit):
+        self._slots = slots
+        self._size = size
+        self._limit = limit
+        # Source and sinks must share a single resource tracker, otherwise
+        # the segment is reported as leaked by the sinks when it is unlinked
+        # (Windows has no resource tracker)
+        if (os.name == 'posix'):
+            mp.resource_tracker.ensure_running()
+
+    def open(self):
+        self._memory = None
+        self._slot_size = None
+        self._frame_stamp = -1
 
-    l = 0
-    r = n - 1
+    def _create(self, size):
+        # Sized from the stream configuration when known, otherwise from the
+        # first packet with headroom for variable size payloads, and capped so
+        # that the ring fits in the segment size limit, larger packets are
+        # sent through the queues
+        self._slot_size = min(_align(max(size + (size // 2), self._size)), (self._limit // self._slots) & ~63)
+        if (self._slot_size > 0):
+            self._memory = mp.shared_memory.SharedMemory(create=True, size=self._slots * self._slot_size)
 
-    while ((r - l) > 1):
-        i = (r + l) // 2
-        t = data[i].timestamp
-        if (t < timestamp):
-            l = i
-        elif (t > timestamp):
-            r = i
-        else:
-            return i
+    def write(self, packet):
+        self._frame_stamp += 1
+
+        payload = packet.payload
+        if (isinstance(payload, (bytes, bytearray, memoryview))):
+            packet.payload = pickle.PickleBuffer(payload)
+
+        buffers = []
+        header = pickle.dumps(packet, protocol=5, buffer_callback=buffers.append)
+        views = [buffer.raw() for buffer in buffers]
+        base = _align(_shared_writer.SLOT_HEADER + (8 * len(views)))
+        size = base + _align(len(header)) + sum([_align(len(view)) for view in views])
+
+        if (self._slot_size is None):
+            self._create(size)
+
+        if (size > self._slot_size):
+            packet.payload = payload
+            return _shared_packet(packet.timestamp, None, None, self._frame_stamp, packet)
+
+        buffer = self._memory.buf
+        offset = (self._frame_stamp % self._slots) * self._slot_size
+        struct.pack_into('<qII', buffer, offset, -1, len(header), len(views))
+        struct.pack_into(f'<{len(views)}Q', buffer, offset + _shared_writer.SLOT_HEADER, *[len(view) for view in views])
+        position = offset + base
+        buffer[position:(position + len(header))] = header
+        position += _align(len(header))
+        for view in views:
+            buffer[position:(position + len(view))] = view
+            position += _align(len(view))
+        struct.pack_into('<q', buffer, offset, self._frame_stamp)
+        
+        return _shared_packet(packet.timestamp, self._memory.name, offset, self._frame_stamp, None)
+
+    def close(self):
+        if (self._memory is not None):
+            self._memory.close()
+            self._memory.unlink()
 
-    return l if (abs(data[l].timestamp - timestamp) < abs(data[r].timestamp - timestamp)) else r
+
+class _shared_reader:
+    def __init__(self):
+        self._memory = dict()
+
+    def _attach(self, name):
+        memory = self._memory.get(name, None)
+        if (memory is None):
+            memory = mp.shared_memory.SharedMemory(name=name)
+            self._memory[name] = memory
+        return memory.buf
+
+    def _get_frame_stamp(self, buffer, offset):
+        return struct.unpack_from('<q', buffer, offset)[0]
+
+    def read(self, data):
+        if (not isinstance(data, _shared_packet)):
+            return data
+        if (data.packet is not None):
+            return data.packet
+        buffer = self._attach(data.name)
+        offset = data.offset
+        frame_stamp, size, count = struct.unpack_from('<qII', buffer, offset)
+        if (frame_stamp != data.frame_stamp):
+            return None
+        lengths = struct.unpack_from(f'<{count}Q', buffer, offset + _shared_writer.SLOT_HEADER)
+        if (self._get_frame_stamp(buffer, offset) != data.frame_stamp):
+            return None
+        position = offset + _align(_shared_writer.SLOT_HEADER + (8 * count))
+        header = bytes(buffer[position:(position + size)])
+        position += _align(size)
+        views = []
+        for length in lengths:
+            views.append(bytearray(buffer[position:(position + length)]))
+            position += _align(length)
+        # The source may have reused the slot while copying
+        if (self._get_frame_stamp(buffer, offset) != data.frame_stamp):
+            return None
+        return pickle.loads(header, buffers=views)
+
+    def close(self):
+        for memory in self._memory.values():
+            memory.close()
+        self._memory.clear()
+
+
+def _get_encoded_frame_size(bitrate, framerate, divisor, size):
+    # Average frame size with headroom for keyframes, bounded by the raw size
+    return size if (bitrate is None) else min((4 * bitrate * divisor) // (8 * framerate), size)
+
+
+def _get_packet_size(receiver):
+    # Upper bound for the frames the receiver returns, 0 for streams with small
+    # packets
+    port = getattr(receiver, 'port', None)
+    if (port in (hl2ss.StreamPort.RM_VLC_LEFTFRONT, hl2ss.StreamPort.RM_VLC_LEFTLEFT, hl2ss.StreamPort.RM_VLC_RIGHTFRONT, hl2ss.StreamPort.RM_VLC_RIGHTRIGHT)):
+        size = hl2ss.Parameters_RM_VLC.PIXELS
+        if (not isinstance(receiver, hl2ss.rx_decoded_rm_vlc) and (receiver.profile != hl2ss.VideoProfile.RAW)):
+            size = _get_encoded_frame_size(receiver.bitrate, hl2ss.Parameters_RM_VLC.FPS, receiver.divisor, size)
+    elif (port == hl2ss.StreamPort.RM_DEPTH_AHAT):
+        size = hl2ss.Parameters_RM_DEPTH_AHAT.PIXELS * 4
+        if (not isinstance(receiver, hl2ss.rx_decoded_rm_depth_ahat) and (receiver.profile_ab != hl2ss.VideoProfile.RAW)):
+            size = _get_encoded_frame_size(receiver.bitrate, hl2ss.Parameters_RM_DEPTH_AHAT.FPS, receiver.divisor, size)
+            if (receiver.profile_z != hl2ss.DepthProfile.SAME):
+                size += hl2ss.Parameters_RM_DEPTH_AHAT.PIXELS * 2
+    elif (port == hl2ss.StreamPort.RM_DEPTH_LONGTHROW):
+        size = hl2ss.Parameters_RM_DEPTH_LONGTHROW.PIXELS * 4
+    elif (port == hl2ss.StreamPort.PERSONAL_VIDEO):
+        size = receiver.width * receiver.height * 4
+        if (not isinstance(receiver, hl2ss.rx_decoded_pv)):
+            size = (receiver.width * receiver.height * 3) // 2
+            if (receiver.profile != hl2ss.VideoProfile.RAW):
+                size = _get_encoded_frame_size(receiver.bitrate, receiver.framerate, receiver.divisor, size)
+    else:
+        return 0
+    # Pickle header, pose and metadata
+    return size + (size // 8) + 4096
+
+
+def _create_writer(transport, buffer_size, receiver, segment_size):
+    if (transport == TransportMode.SHARED_MEMORY):
+        return _shared_writer(buffer_size + max(buffer_size // 2, 1), _get_packet_size(receiver), segment_size)
+    
+    return _queue_writer()
 
 
 #------------------------------------------------------------------------------
@@ -81,9 +295,10 @@ class _net_source:
 
 
 class _source(mp.Process):
-    def __init__(self, receiver, event_stop, source_wires, interconnect_wires):
+    def __init__(self, receiver, writer, event_stop, source_wires, interconnect_wires):
         super().__init__()
         self._source = receiver
+        self._writer = writer
         self._event_stop = event_stop
         self._source_dout = source_wires.source_dout
         self._interconnect_semaphore = interconnect_wires.interconnect_semaphore
@@ -92,25 +307,59 @@ class _source(mp.Process):
         self._event_stop.set()
 
     def run(self):
+        self._writer.open()
         self._source.open()
         while (not self._event_stop.is_set()):
-            self._source_dout.put(self._source.get_next_packet())
-            self._interconnect_semaphore.release()
+            self._source_dout.put(self._writer.write(self._source.get_next_packet()))
+            if (self._interconnect_semaphore is not None):
+                self._interconnect_semaphore.release()
         self._source.close()
+        self._writer.close()
 
 
 def _create_interface_source():
     return _net_source(mp.Queue())
 
 
-def _create_source(receiver, source_wires, interconnect_wires):
-    return _source(receiver, mp.Event(), source_wires, interconnect_wires)
+def _create_interface_source_pipe():
+    return _net_source(_create_channel(False))
+
+
+def _create_source(receiver, writer, source_wires, interconnect_wires):
+    return _source(receiver, writer, mp.Event(), source_wires, interconnect_wires)
 
 
 #------------------------------------------------------------------------------
 # Interconnect
 #------------------------------------------------------------------------------
 
+# Interconnect Mode
+# 0: Polling interconnect, sinks communicate through Manager queues and all
+#    sinks are scanned each time the shared semaphore is released
+# 1: Event driven interconnect, source and sinks communicate through pipes
+#    and only the pipes with pending messages are served
+class InterconnectMode:
+    POLLING = 0
+    PIPE = 1
+
+
+class _channel:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def put(self, data):
+        self.writer.send(data)
+
+    def get(self):
+        return self.reader.recv()
+
+
+def _create_channel(duplex):
+    reader, writer = mp.Pipe(duplex)
+    return _channel(reader, writer)
+
+
 class _net_interconnect:
     def __init__(self, interconnect_din, interconnect_dout, interconnect_semaphore):
         self.interconnect_din = interconnect_din
@@ -125,6 +374,7 @@ class _interconnect(mp.Process):
     IPC_SINK_GET_NEAREST = -2
     IPC_SINK_GET_FRAME_STAMP = -3
     IPC_SINK_GET_MOST_RECENT_FRAME = -4
+    IPC_SINK_GET_NEAREST_MANY = -5
     
     def __init__(self, buffer_size, event_stop, source_wires, interconnect_wires):
         super().__init__()
@@ -161,9 +411,16 @@ class _interconnect(mp.Process):
 
     def _get_nearest(self, sink_din, sink_dout):
         timestamp = sink_dout.get()
-        buffer = self._buffer.get()
-        index = _get_nearest_packet(buffer, timestamp)
-        response = (None, None) if (index is None) else (self._frame_stamp - self._buffer.length() + 1 + index, buffer[index])
+        index = self._buffer.find_nearest(timestamp)
+        response = (None, None) if (index is None) else (self._frame_stamp - self._buffer.length() + 1 + index, self._buffer.at(index))
+        sink_din.put(response[0])
+        sink_din.put(response[1])
+
+    def _get_nearest_many(self, sink_din, sink_dout):
+        timestamps = sink_dout.get()
+        bracket = sink_dout.get()
+        index = self._buffer.find_bracket_many(timestamps) if (bracket) else self._buffer.find_nearest_many(timestamps)
+        response = (None, None) if (index is None) else (self._frame_stamp - self._buffer.length() + 1 + index, [tuple([self._buffer.at(i) for i in pair]) for pair in index] if (bracket) else [self._buffer.at(i) for i in index])
         sink_din.put(response[0])
         sink_din.put(response[1])
 
@@ -177,20 +434,23 @@ class _interconnect(mp.Process):
     def _get_buffered_frame(self, sink_din, sink_dout, frame_stamp):
         n = self._buffer.length()
         index = n - 1 - self._frame_stamp + frame_stamp
-        response = (-1, None) if (index < 0) else (1, None) if (index >= n) else (0, self._buffer.get()[index])
+        response = (-1, None) if (index < 0) else (1, None) if (index >= n) else (0, self._buffer.at(index))
         sink_din.put(response[0])
         sink_din.put(response[1])
 
-    def _process_source(self):
-        try:
-            data = self._source_dout.get_nowait()
-        except:
-            return
+    def _push(self, data):
         self._frame_stamp += 1
         self._buffer.append(data)
         for _, _, ipc in self._sink.values():
             if (ipc is not None):
                 ipc.release()
+
+    def _process_source(self):
+        try:
+            data = self._source_dout.get_nowait()
+        except:
+            return
+        self._push(data)
         self._interconnect_semaphore.acquire()
 
     def _process_control(self):
@@ -202,11 +462,7 @@ class _interconnect(mp.Process):
             self._attach()
         self._interconnect_semaphore.acquire()
 
-    def _process_sink_message(self, sink_din, sink_dout):
-        try:
-            message = sink_dout.get_nowait()
-        except:
-            return
+    def _process_sink_request(self, message, sink_din, sink_dout):
         if (message == _interconnect.IPC_SINK_DETACH):
             self._detach(sink_din, sink_dout)
         elif (message == _interconnect.IPC_SINK_GET_NEAREST):
@@ -214,9 +470,18 @@ class _interconnect(mp.Process):
         elif (message == _interconnect.IPC_SINK_GET_FRAME_STAMP):
             self._get_frame_stamp(sink_din, sink_dout)         
         elif (message == _interconnect.IPC_SINK_GET_MOST_RECENT_FRAME):
-            self._get_most_recent_frame(sink_din, sink_dout)        
+            self._get_most_recent_frame(sink_din, sink_dout)
+        elif (message == _interconnect.IPC_SINK_GET_NEAREST_MANY):
+            self._get_nearest_many(sink_din, sink_dout)        
         else:
             self._get_buffered_frame(sink_din, sink_dout, message)
+
+    def _process_sink_message(self, sink_din, sink_dout):
+        try:
+            message = sink_dout.get_nowait()
+        except:
+            return
+        self._process_sink_request(message, sink_din, sink_dout)
         self._interconnect_semaphore.acquire()
 
     def _process_sink(self):
@@ -240,14 +505,75 @@ class _interconnect(mp.Process):
             self._process_sink()
 
 
+class _interconnect_pipe(_interconnect):
+    IPC_CONTROL_WAKE = 1
+
+    def stop(self):
+        self._event_stop.set()
+        self._interconnect_din.put(_interconnect_pipe.IPC_CONTROL_WAKE)
+
+    def attach_sink(self, sink_wires):
+        self._interconnect_din.put(_interconnect.IPC_CONTROL_ATTACH)
+        self._interconnect_din.put(sink_wires)
+
+    def _attach(self):
+        self._key += 1
+        sink_wires = self._interconnect_din.get()
+        self._sink[self._key] = (sink_wires.sink_din, sink_wires.sink_dout, sink_wires.sink_semaphore)
+        self._wait[sink_wires.sink_dout.reader] = self._key
+        sink_wires.sink_din.put(self._key)
+        sink_wires.sink_din.put(self._frame_stamp)
+
+    def _process_control(self):
+        message = self._interconnect_din.get()
+        if (message == _interconnect.IPC_CONTROL_ATTACH):
+            self._attach()
+
+    def _process_sink(self, key):
+        sink_din, sink_dout, _ = self._sink[key]
+        try:
+            message = sink_dout.get()
+        except EOFError:
+            self._remove.append(key)
+            return
+        self._process_sink_request(message, sink_din, sink_dout)
+
+    def run(self):
+        self._buffer = _RingBuffer(self._buffer_size)
+        self._frame_stamp = -1
+        self._sink = dict()
+        self._key = 0
+        self._wait = { self._source_dout.reader : None, self._interconnect_din.reader : None }
+
+        while (not self._event_stop.is_set()):
+            self._remove = []
+            for reader in mp.connection.wait(list(self._wait.keys())):
+                if (reader is self._source_dout.reader):
+                    self._push(self._source_dout.get())
+                elif (reader is self._interconnect_din.reader):
+                    self._process_control()
+                else:
+                    self._process_sink(self._wait[reader])
+            for key in self._remove:
+                self._wait.pop(self._sink.pop(key)[1].reader)
+
+
 def _create_interface_interconnect():
     return _net_interconnect(mp.Queue(), mp.Queue(), mp.Semaphore(_interconnect.IPC_SEMAPHORE_VALUE))
 
 
+def _create_interface_interconnect_pipe():
+    return _net_interconnect(_create_channel(False), None, None)
+
+
 def _create_interconnect(buffer_size, source_wires, interconnect_wires):
     return _interconnect(buffer_size, mp.Event(), source_wires, interconnect_wires)
 
 
+def _create_interconnect_pipe(buffer_size, source_wires, interconnect_wires):
+    return _interconnect_pipe(buffer_size, mp.Event(), source_wires, interconnect_wires)
+
+
 #------------------------------------------------------------------------------
 # Sink
 #------------------------------------------------------------------------------
@@ -265,6 +591,11 @@ class _sink:
         self._sink_dout = sink_wires.sink_dout
         self._sink_semaphore = sink_wires.sink_semaphore
         self._interconnect_semaphore = interconnect_wires.interconnect_semaphore
+        self._reader = _shared_reader()
+
+    def _notify(self):
+        if (self._interconnect_semaphore is not None):
+            self._interconnect_semaphore.release()
 
     def acquire(self):
         self._sink_semaphore.acquire()
@@ -280,41 +611,70 @@ class _sink:
     def detach(self):
         self._sink_dout.put(_interconnect.IPC_SINK_DETACH)
         self._sink_dout.put(self._key)
-        self._interconnect_semaphore.release()
+        self._notify()
+        self._reader.close()
 
     def get_nearest(self, timestamp):
         self._sink_dout.put(_interconnect.IPC_SINK_GET_NEAREST)
         self._sink_dout.put(timestamp)
-        self._interconnect_semaphore.release()
+        self._notify()
         frame_stamp = self._sink_din.get()
+        data = self._reader.read(self._sink_din.get())
+        return (frame_stamp, data) if (data is not None) else (None, None)
+
+    # Nearest frames for an array of timestamps in a single request
+    # If bracket is True, returns the frames before and after each timestamp
+    # (frame_stamps has shape (N, 2) and data is a list of (before, after))
+    def put_nearest_many(self, timestamps, bracket):
+        self._sink_dout.put(_interconnect.IPC_SINK_GET_NEAREST_MANY)
+        self._sink_dout.put(np.asarray(timestamps, dtype=np.uint64))
+        self._sink_dout.put(bracket)
+        self._notify()
+
+    def get_nearest_many_response(self):
+        frame_stamps = self._sink_din.get()
         data = self._sink_din.get()
-        return (frame_stamp, data)
+        if (data is not None):
+            data = [tuple([self._reader.read(item) for item in pair]) for pair in data] if (frame_stamps.ndim > 1) else [self._reader.read(item) for item in data]
+            # Frames whose slot was reused are reported as missing (-1, None)
+            frame_stamps = np.array(frame_stamps)
+            frame_stamps[np.array([[item is None for item in pair] for pair in data] if (frame_stamps.ndim > 1) else [item is None for item in data], dtype=bool).reshape(frame_stamps.shape)] = -1
+        return (frame_stamps, data)
+
+    def get_nearest_many(self, timestamps, bracket=False):
+        self.put_nearest_many(timestamps, bracket)
+        return self.get_nearest_many_response()
 
     def get_frame_stamp(self):
         self._sink_dout.put(_interconnect.IPC_SINK_GET_FRAME_STAMP)
-        self._interconnect_semaphore.release()
+        self._notify()
         frame_stamp = self._sink_din.get()
         return frame_stamp
 
     def get_most_recent_frame(self):
         self._sink_dout.put(_interconnect.IPC_SINK_GET_MOST_RECENT_FRAME)
-        self._interconnect_semaphore.release()
+        self._notify()
         frame_stamp = self._sink_din.get()
-        data = self._sink_din.get()
-        return (frame_stamp, data)
+        data = self._reader.read(self._sink_din.get())
+        return (frame_stamp, data) if (data is not None) else (None, None)
 
     def get_buffered_frame(self, frame_stamp):
         self._sink_dout.put(frame_stamp)
-        self._interconnect_semaphore.release()
+        self._notify()
         state = self._sink_din.get()
-        data = self._sink_din.get()
-        return (state, data)
+        data = self._reader.read(self._sink_din.get())
+        return (state, data) if ((state != 0) or (data is not None)) else (-1, None)
 
 
 def _create_interface_sink(sink_din, sink_dout, sink_semaphore):
     return _net_sink(sink_din, sink_dout, sink_semaphore)
 
 
+def _create_interface_sink_pipe(sink_semaphore):
+    a, b = mp.Pipe(True)
+    return (_net_sink(_channel(a, a), _channel(a, a), sink_semaphore), _net_sink(_channel(b, b), _channel(b, b), sink_semaphore))
+
+
 def _create_sink(sink_wires, interconnect_wires):
     return _sink(sink_wires, interconnect_wires)
 
@@ -324,11 +684,17 @@ def _create_sink(sink_wires, interconnect_wires):
 #------------------------------------------------------------------------------
 
 class _module:
-    def __init__(self, receiver, buffer_size):
-        self._source_wires = _create_interface_source()
-        self._interconnect_wires = _create_interface_interconnect()
-        self._source = _create_source(receiver, self._source_wires, self._interconnect_wires)
-        self._interconnect = _create_interconnect(buffer_size, self._source_wires, self._interconnect_wires)
+    def __init__(self, receiver, buffer_size, transport, interconnect, segment_size):
+        self._interconnect_mode = interconnect
+        if (interconnect == InterconnectMode.PIPE):
+            self._source_wires = _create_interface_source_pipe()
+            self._interconnect_wires = _create_interface_interconnect_pipe()
+            self._interconnect = _create_interconnect_pipe(buffer_size, self._source_wires, self._interconnect_wires)
+        else:
+            self._source_wires = _create_interface_source()
+            self._interconnect_wires = _create_interface_interconnect()
+            self._interconnect = _create_interconnect(buffer_size, self._source_wires, self._interconnect_wires)
+        self._source = _create_source(receiver, _create_writer(transport, buffer_size, receiver, segment_size), self._source_wires, self._interconnect_wires)
 
     def start(self):
         self._interconnect.start()
@@ -340,6 +706,12 @@ class _module:
         self._interconnect.stop()
         self._interconnect.join()
 
+    def create_interface_sink(self, manager, sink_semaphore):
+        if (self._interconnect_mode == InterconnectMode.PIPE):
+            return _create_interface_sink_pipe(sink_semaphore)
+        sink_wires = _create_interface_sink(manager.Queue(), manager.Queue(), sink_semaphore)
+        return (sink_wires, sink_wires)
+
     def attach_sink(self, sink_wires):
         return self._interconnect.attach_sink(sink_wires)
 
@@ -359,8 +731,8 @@ class producer:
     def configure(self, port, receiver):
         self._rx[port] = receiver
 
-    def initialize(self, port, buffer_size):
-        self._producer[port] = _module(self._rx[port], buffer_size)
+    def initialize(self, port, buffer_size, transport=TransportMode.QUEUE, interconnect=InterconnectMode.POLLING, segment_size=TransportMode.SEGMENT_SIZE):
+        self._producer[port] = _module(self._rx[port], buffer_size, transport, interconnect, segment_size)
 
     def start(self, port):        
         self._producer[port].start()
@@ -374,6 +746,9 @@ class producer:
     def _get_interface(self, port):
         return self._producer[port].get_interface()
 
+    def _create_interface_sink(self, port, manager, sink_semaphore):
+        return self._producer[port].create_interface_sink(manager, sink_semaphore)
+
     def _attach_sink(self, port, sink_wires):
         self._producer[port].attach_sink(sink_wires)
 
@@ -390,10 +765,10 @@ class consumer:
 
     def create_sink(self, producer, port, manager, semaphore):
         sink_semaphore = None if (semaphore is None) else manager.Semaphore(_interconnect.IPC_SEMAPHORE_VALUE) if (semaphore is ...) else self._sink_semaphore[semaphore]
-        sink_wires = _create_interface_sink(manager.Queue(), manager.Queue(), sink_semaphore)
+        sink_wires, interconnect_sink_wires = producer._create_interface_sink(port, manager, sink_semaphore)
         sink = _create_sink(sink_wires, producer._get_interface(port))
 
-        producer._attach_sink(port, sink_wires)
+        producer._attach_sink(port, interconnect_sink_wires)
 
         self._sink_semaphore[port] = sink_semaphore
         self._sink_wires[port] = sink_wires
@@ -401,3 +776,120 @@ class consumer:
 
         return sink
 
+    # Requests are sent to all sinks before waiting for the responses
+    def get_nearest_many(self, ports, timestamps, bracket=False):
+        for port in ports:
+            self._sink[port].put_nearest_many(timestamps, bracket)
+        return { port : self._sink[port].get_nearest_many_response() for port in ports }
+
+
+#------------------------------------------------------------------------------
+# Synchronizer
+#------------------------------------------------------------------------------
+
+# Synchronizer Drop Policy
+# 0: Align the most recent reference frame, older reference frames are skipped
+# 1: Align every reference frame in order, if the synchronizer falls behind
+#    the reference buffer it resumes from the most recent reference frame
+class SyncPolicy:
+    LATEST = 0
+    EXHAUSTIVE = 1
+
+
+class _SyncState:
+    PENDING = 0
+    ALIGNED = 1
+    DROPPED = 2
+
+
+class _sync_skew:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.total_squared = 0
+        self.maximum = 0
+
+    def add(self, skew):
+        self.count += 1
+        self.total += skew
+        self.total_squared += skew * skew
+        self.maximum = max(self.maximum, abs(skew))
+
+    def get_mean(self):
+        return (self.total / self.count) if (self.count > 0) else 0
+
+    def get_std(self):
+        return (max((self.total_squared / self.count) - (self.get_mean() ** 2), 0) ** 0.5) if (self.count > 0) else 0
+
+
+class synchronizer:
+    # tolerances: {port : maximum absolute timestamp difference} for the
+    # ports to align to the reference port, all ports must have a sink in
+    # consumer
+    def __init__(self, consumer, reference, tolerances, policy):
+        self._consumer = consumer
+        self._reference = reference
+        self._sink = consumer._sink[reference]
+        self._tolerances = tolerances
+        self._ports = list(tolerances.keys())
+        self._policy = policy
+        self._frame_stamp = None
+        self.emitted = 0
+        self.dropped = 0
+        self.skew = { port : _sync_skew() for port in self._ports }
+
+    def acquire(self):
+        self._sink.acquire()
+
+    def _get_reference(self):
+        if ((self._policy == SyncPolicy.EXHAUSTIVE) and (self._frame_stamp is not None)):
+            state, data = self._sink.get_buffered_frame(self._frame_stamp + 1)
+            if (state == 0):
+                return (self._frame_stamp + 1, data)
+            if (state > 0):
+                return (None, None)
+        frame_stamp, data = self._sink.get_most_recent_frame()
+        if ((data is None) or ((self._frame_stamp is not None) and (frame_stamp <= self._frame_stamp))):
+            return (None, None)
+        return (frame_stamp, data)
+
+    def _align(self, frame_stamp, data):
+        # Bracketed queries also tell if a port has frames after the reference
+        # without querying its frame stamp
+        response = self._consumer.get_nearest_many(self._ports, [data.timestamp], True)
+        aligned = { self._reference : (frame_stamp, data) }
+        skew = dict()
+        for port in self._ports:
+            frame_stamps, frames = response[port]
+            if ((frames is None) or (frames[0][0] is None) or (frames[0][1] is None)):
+                return (_SyncState.PENDING, None)
+            dl = abs(int(frames[0][0].timestamp) - int(data.timestamp))
+            dr = abs(int(frames[0][1].timestamp) - int(data.timestamp))
+            nearest = 0 if (dl < dr) else 1
+            skew[port] = int(frames[0][nearest].timestamp) - int(data.timestamp)
+            if (abs(skew[port]) > self._tolerances[port]):
+                if ((skew[port] < 0) and (frame_stamps[0][0] == frame_stamps[0][1])):
+                    return (_SyncState.PENDING, None)
+                return (_SyncState.DROPPED, None)
+            aligned[port] = (int(frame_stamps[0][nearest]), frames[0][nearest])
+        for port in self._ports:
+            self.skew[port].add(skew[port])
+        return (_SyncState.ALIGNED, aligned)
+
+    # Returns {port : (frame_stamp, data)} for the next complete set or None
+    # if no complete set is available yet
+    def get_next(self):
+        while (True):
+            frame_stamp, data = self._get_reference()
+            if (data is None):
+                return None
+            state, aligned = self._align(frame_stamp, data)
+            if (state == _SyncState.PENDING):
+                return None
+            if (self._frame_stamp is not None):
+                self.dropped += frame_stamp - self._frame_stamp - 1
+            self._frame_stamp = frame_stamp
+            if (state == _SyncState.ALIGNED):
+                self.emitted += 1
+                return aligned
+            self.dropped += 1
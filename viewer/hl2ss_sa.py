@@ -1,5 +1,8 @@
 
+import os
+import concurrent.futures
 import multiprocessing as mp
+import multiprocessing.shared_memory
 import threading
 import numpy as np
 import open3d as o3d
@@ -15,13 +18,23 @@ import hl2ss_3dcv
 def sm_mesh_to_open3d_triangle_mesh(mesh):
     open3d_mesh = o3d.geometry.TriangleMesh()
 
-    open3d_mesh.vertices       = o3d.utility.Vector3dVector(mesh.vertex_positions[:, 0:3])
-    open3d_mesh.vertex_normals = o3d.utility.Vector3dVector(mesh.vertex_normals[:, 0:3])
+    open3d_mesh.vertices       = o3d.utility.Vector3dVector(mesh.vertex_positions[:, 0:3].astype(np.float64, copy=False))
+    open3d_mesh.vertex_normals = o3d.utility.Vector3dVector(mesh.vertex_normals[:, 0:3].astype(np.float64, copy=False))
     open3d_mesh.triangles      = o3d.utility.Vector3iVector(mesh.triangle_indices)
 
     return open3d_mesh
 
 
+def sm_mesh_to_open3d_tensor_triangle_mesh(mesh, device=None):
+    open3d_mesh = o3d.t.geometry.TriangleMesh(o3d.core.Device('CPU:0') if (device is None) else device)
+
+    open3d_mesh.vertex.positions = o3d.core.Tensor(np.ascontiguousarray(mesh.vertex_positions[:, 0:3], dtype=np.float32), device=open3d_mesh.device)
+    open3d_mesh.vertex.normals   = o3d.core.Tensor(np.ascontiguousarray(mesh.vertex_normals[:, 0:3], dtype=np.float32), device=open3d_mesh.device)
+    open3d_mesh.triangle.indices = o3d.core.Tensor(mesh.triangle_indices.astype(np.int32, copy=False), device=open3d_mesh.device)
+
+    return open3d_mesh
+
+
 def su_mesh_to_open3d_triangle_mesh(mesh):
     open3d_mesh = o3d.geometry.TriangleMesh()
 
@@ -36,10 +49,33 @@ def su_mesh_to_open3d_triangle_mesh(mesh):
 #------------------------------------------------------------------------------
 
 class _sm_manager_entry:
-    def __init__(self, update_time, mesh, rcs):
+    def __init__(self, update_time, mesh, tpcm, size):
         self.update_time = update_time
         self.mesh = mesh
-        self.rcs = rcs
+        self.tpcm = tpcm
+        self.size = size
+        positions = mesh.vertex_positions[:, 0:3]
+        lower = np.min(positions, axis=0) if (positions.shape[0] > 0) else np.zeros(3)
+        upper = np.max(positions, axis=0) if (positions.shape[0] > 0) else np.zeros(3)
+        self.center = (lower + upper) / 2
+        self.radius = np.linalg.norm(upper - lower) / 2
+
+
+# Bytes downloaded for the mesh, for any vertex position, triangle index and
+# vertex normal format
+def _sm_mesh_size(mesh):
+    return memoryview(mesh.vertex_positions).nbytes + memoryview(mesh.triangle_indices).nbytes + memoryview(mesh.vertex_normals).nbytes + memoryview(mesh.bounds).nbytes
+
+
+def _sm_create_raycasting_scene(meshes):
+    if (len(meshes) <= 0):
+        return None
+    offsets = np.cumsum([0] + [mesh.vertex_positions.shape[0] for mesh in meshes[:-1]])
+    vertices = np.concatenate([mesh.vertex_positions[:, 0:3] for mesh in meshes]).astype(np.float32, copy=False)
+    triangles = np.concatenate([mesh.triangle_indices + offset for mesh, offset in zip(meshes, offsets)]).astype(np.uint32, copy=False)
+    rcs = o3d.t.geometry.RaycastingScene()
+    rcs.add_triangles(o3d.core.Tensor(vertices), o3d.core.Tensor(triangles))
+    return rcs
 
 
 class sm_manager:
@@ -53,7 +89,14 @@ class sm_manager:
         self._bounds = False
         self._ipc = hl2ss_lnm.ipc_sm(host, hl2ss.IPCPort.SPATIAL_MAPPING)
         self._surfaces = {}
+        self._scene = None
         self._volumes = None
+        self._ray_grid = None
+        self._ray_grid_rays = None
+        self._frustum = None
+        self._position = None
+        self._lod = None
+        self._budget = None
 
     def open(self):
         self._ipc.open()
@@ -62,12 +105,64 @@ class sm_manager:
     def set_volumes(self, volumes):
         self._volumes = volumes
 
+    def set_view(self, frustum, position):
+        self._frustum = None if (frustum is None) else np.array(frustum, dtype=np.float64).reshape((-1, 4))
+        self._position = None if (position is None) else np.array(position, dtype=np.float64).reshape((3,))
+
+    def set_lod(self, levels):
+        self._lod = None if (levels is None) else sorted([(float(distance), tpcm) for distance, tpcm in levels])
+
+    def set_budget(self, max_bytes):
+        self._budget = max_bytes
+
+    def _get_distance(self, entry):
+        return max(np.linalg.norm(entry.center - self._position) - entry.radius, 0) if ((entry is not None) and (self._position is not None)) else None
+
+    def _in_frustum(self, entry):
+        return (entry is not None) and (self._frustum is not None) and np.all((self._frustum[:, 0:3] @ entry.center + self._frustum[:, 3]) <= entry.radius)
+
+    def _get_tpcm(self, entry):
+        if ((self._lod is None) or (self._position is None)):
+            return self._tpcm
+        distance = self._get_distance(entry)
+        if (distance is None):
+            return self._lod[-1][1]
+        for level_distance, tpcm in self._lod:
+            if (distance <= level_distance):
+                return tpcm
+        return self._lod[-1][1]
+
+    def _get_priority(self, entry):
+        if ((self._frustum is None) and (self._position is None)):
+            return (0, 0)
+        if (entry is None):
+            return (1, 0)
+        distance = self._get_distance(entry)
+        return (0 if (self._in_frustum(entry)) else 2, 0 if (distance is None) else distance)
+
+    def _get_size(self, entry, tpcm):
+        if (entry is not None):
+            return entry.size * (tpcm / entry.tpcm)
+        sizes = [surface.size / surface.tpcm for surface in self._surfaces.values()]
+        return (sum(sizes) / len(sizes)) * tpcm if (len(sizes) > 0) else 0
+
+    def _create_entry(self, mesh, surface_info, tpcm):
+        size = _sm_mesh_size(mesh)
+        mesh.unpack(self._vpf, self._tif, self._vnf)
+        hl2ss_3dcv.sm_mesh_cast(mesh, np.float32, np.uint32, np.float32)
+        hl2ss_3dcv.sm_mesh_normalize_inplace(mesh)
+        return surface_info.id, _sm_manager_entry(surface_info.update_time, mesh, tpcm, size)
+
     def _load_updated_surfaces(self):
         self._surfaces = self._updated_surfaces
+        self._scene = self._updated_scene
 
     def _get_surfaces(self):
         return self._surfaces.values()
 
+    def _get_scene(self):
+        return self._scene
+
     def get_observed_surfaces(self):
         self._updated_surfaces = {}
         tasks = hl2ss.sm_mesh_task()        
@@ -77,32 +172,49 @@ class sm_manager:
             self._ipc.set_volumes(self._volumes)
             self._volumes = None
         
+        candidates = []
+
         for surface_info in self._ipc.get_observed_surfaces():
             id = surface_info.id
             surface_info.id = surface_info.id.hex()
-            if (surface_info.id in self._surfaces):
-                previous_entry = self._surfaces[surface_info.id]
-                if (surface_info.update_time <= previous_entry.update_time):
+            previous_entry = self._surfaces.get(surface_info.id, None)
+            tpcm = self._get_tpcm(previous_entry)
+            if ((previous_entry is not None) and (surface_info.update_time <= previous_entry.update_time) and (tpcm <= previous_entry.tpcm)):
+                self._updated_surfaces[surface_info.id] = previous_entry
+                continue
+            candidates.append((self._get_priority(previous_entry), id, surface_info, tpcm, previous_entry))
+
+        # Closest surfaces in view first, then new surfaces, then the rest
+        # Surfaces over the remaining byte budget keep their previous mesh
+        # until the next update, a new surface larger than the budget is only
+        # requested when it comes first, which exceeds the budget once
+        candidates.sort(key=lambda candidate : candidate[0])
+        budget = self._budget
+
+        for _, id, surface_info, tpcm, previous_entry in candidates:
+            size = self._get_size(previous_entry, tpcm)
+            if ((budget is not None) and (size > budget) and ((previous_entry is not None) or (len(updated_surfaces) > 0))):
+                if (previous_entry is not None):
                     self._updated_surfaces[surface_info.id] = previous_entry
-                    continue
-            tasks.add_task(id, self._tpcm, self._vpf, self._tif, self._vnf, self._normals, self._bounds)
-            updated_surfaces.append(surface_info)
+                continue
+            if (budget is not None):
+                budget -= size
+            tasks.add_task(id, tpcm, self._vpf, self._tif, self._vnf, self._normals, self._bounds)
+            updated_surfaces.append((surface_info, tpcm))
 
         count = len(updated_surfaces)
         if (count <= 0):
             return
 
-        for index, mesh in self._ipc.get_meshes(tasks, self._threads).items():
-            if (mesh is None):
-                continue
-            mesh.unpack(self._vpf, self._tif, self._vnf)
-            hl2ss_3dcv.sm_mesh_cast(mesh, np.float64, np.uint32, np.float64)
-            hl2ss_3dcv.sm_mesh_normalize(mesh)
-            rcs = o3d.t.geometry.RaycastingScene()
-            rcs.add_triangles(o3d.t.geometry.TriangleMesh.from_legacy(sm_mesh_to_open3d_triangle_mesh(mesh)))
-            surface_info = updated_surfaces[index]
-            self._updated_surfaces[surface_info.id] = _sm_manager_entry(surface_info.update_time, mesh, rcs)
-            
+        # Process each mesh while the next ones are still downloading
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            futures = [executor.submit(self._create_entry, mesh, *updated_surfaces[index]) for index, mesh in self._ipc.get_meshes_stream(tasks, self._threads) if (mesh is not None)]
+
+        for future in futures:
+            id, entry = future.result()
+            self._updated_surfaces[id] = entry
+
+        self._updated_scene = _sm_create_raycasting_scene([entry.mesh for entry in self._updated_surfaces.values()])
         self._load_updated_surfaces()
     
     def close(self):
@@ -113,13 +225,25 @@ class sm_manager:
         return [surface.mesh for surface in surfaces]
 
     def cast_rays(self, rays):
-        surfaces = self._get_surfaces()
-        n = len(surfaces)
-        distances = np.ones(rays.shape[0:-1] + (n if (n > 0) else 1,)) * np.inf
-        for index, entry in enumerate(surfaces):
-            distances[..., index] = entry.rcs.cast_rays(rays)['t_hit'].numpy()
-        distances = np.min(distances, axis=-1)
-        return distances
+        scene = self._get_scene()
+        if (scene is None):
+            return np.ones(rays.shape[0:-1]) * np.inf
+        return scene.cast_rays(rays)['t_hit'].numpy().astype(np.float64)
+
+    def set_ray_grid(self, rays):
+        self._ray_grid = np.array(rays, dtype=np.float32)
+        self._ray_grid_rays = np.empty(rays.shape[0:-1] + (6,), dtype=np.float32)
+
+    def cast_ray_grid(self, camera2world):
+        if (self._ray_grid is None):
+            raise Exception('No ray grid, call set_ray_grid first')
+        rays = self._ray_grid_rays
+        rays[..., 0:3] = camera2world[3, :3]
+        np.matmul(self._ray_grid, camera2world[:3, :3].astype(np.float32), out=rays[..., 3:6])
+        scene = self._get_scene()
+        if (scene is None):
+            return np.ones(rays.shape[0:-1], dtype=np.float32) * np.inf
+        return scene.cast_rays(rays)['t_hit'].numpy()
 
 
 class sm_mt_manager(sm_manager):
@@ -138,6 +262,12 @@ class sm_mt_manager(sm_manager):
         surfaces = super()._get_surfaces()
         self._lock.release()
         return surfaces
+
+    def _get_scene(self):
+        self._lock.acquire()
+        scene = super()._get_scene()
+        self._lock.release()
+        return scene
     
     def get_observed_surfaces(self):
         if (self._task is not None):
@@ -158,6 +288,11 @@ class sm_mp_manager(mp.Process):
     IPC_SET_VOLUMES = 1
     IPC_GET_OBSERVED_SURFACES = 2
     IPC_CAST_RAYS = 3
+    IPC_SET_RAY_GRID = 4
+    IPC_CAST_RAY_GRID = 5
+    IPC_SET_VIEW = 6
+    IPC_SET_LOD = 7
+    IPC_SET_BUDGET = 8
 
     def __init__(self, host, triangles_per_cubic_meter, threads):
         super().__init__()
@@ -165,14 +300,29 @@ class sm_mp_manager(mp.Process):
         self._din = mp.Queue()
         self._dout = mp.Queue()        
         self._ipc = sm_mt_manager(host, triangles_per_cubic_meter, threads)
+        self._memory = None
+        self._depth = None
+        # Share the resource tracker with the worker so that attaching to the
+        # depth buffer does not report it as leaked when the worker exits
+        # (Windows has no resource tracker)
+        if (os.name == 'posix'):
+            mp.resource_tracker.ensure_running()
 
     def open(self):
         self.start()
 
+    def _release_depth(self):
+        self._depth = None
+        if (self._memory is not None):
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
     def close(self):
         self._din.put(sm_mp_manager.IPC_STOP)
         self._semaphore.release()
         self.join()
+        self._release_depth()
 
     def set_volumes(self, volumes):
         self._din.put(sm_mp_manager.IPC_SET_VOLUMES)
@@ -183,12 +333,49 @@ class sm_mp_manager(mp.Process):
         self._din.put(sm_mp_manager.IPC_GET_OBSERVED_SURFACES)
         self._semaphore.release()
 
+    def set_view(self, frustum, position):
+        self._din.put(sm_mp_manager.IPC_SET_VIEW)
+        self._din.put((frustum, position))
+        self._semaphore.release()
+
+    def set_lod(self, levels):
+        self._din.put(sm_mp_manager.IPC_SET_LOD)
+        self._din.put(levels)
+        self._semaphore.release()
+
+    def set_budget(self, max_bytes):
+        self._din.put(sm_mp_manager.IPC_SET_BUDGET)
+        self._din.put(max_bytes)
+        self._semaphore.release()
+
     def cast_rays(self, rays):
         self._din.put(sm_mp_manager.IPC_CAST_RAYS)
         self._din.put(rays)
         self._semaphore.release()
         d = self._dout.get()
         return d
+
+    def set_ray_grid(self, rays):
+        shape = rays.shape[0:-1]
+        memory = mp.shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1) * 4)
+        self._din.put(sm_mp_manager.IPC_SET_RAY_GRID)
+        self._din.put((np.array(rays, dtype=np.float32), memory.name))
+        self._semaphore.release()
+        # The previous buffer can only be unlinked once the worker detached
+        # from it and attached to the new one
+        self._dout.get()
+        self._release_depth()
+        self._memory = memory
+        self._depth = np.ndarray(shape, dtype=np.float32, buffer=self._memory.buf)
+
+    def cast_ray_grid(self, camera2world):
+        if (self._depth is None):
+            raise Exception('No ray grid, call set_ray_grid first')
+        self._din.put(sm_mp_manager.IPC_CAST_RAY_GRID)
+        self._din.put(camera2world)
+        self._semaphore.release()
+        self._dout.get()
+        return self._depth.copy()
     
     def _set_volumes(self):
         volumes = self._din.get()
@@ -197,10 +384,41 @@ class sm_mp_manager(mp.Process):
     def _get_observed_surfaces(self):
         self._ipc.get_observed_surfaces()
 
+    def _set_view(self):
+        frustum, position = self._din.get()
+        self._ipc.set_view(frustum, position)
+
+    def _set_lod(self):
+        levels = self._din.get()
+        self._ipc.set_lod(levels)
+
+    def _set_budget(self):
+        max_bytes = self._din.get()
+        self._ipc.set_budget(max_bytes)
+
     def _cast_rays(self):
         rays = self._din.get()
         d = self._ipc.cast_rays(rays)
         self._dout.put(d)
+
+    def _detach_depth(self):
+        self._depth = None
+        if (self._memory is not None):
+            self._memory.close()
+            self._memory = None
+
+    def _set_ray_grid(self):
+        rays, name = self._din.get()
+        self._detach_depth()
+        self._memory = mp.shared_memory.SharedMemory(name=name)
+        self._depth = np.ndarray(rays.shape[0:-1], dtype=np.float32, buffer=self._memory.buf)
+        self._ipc.set_ray_grid(rays)
+        self._dout.put(True)
+
+    def _cast_ray_grid(self):
+        camera2world = self._din.get()
+        self._depth[...] = self._ipc.cast_ray_grid(camera2world)
+        self._dout.put(True)
     
     def run(self):
         self._ipc.open()
@@ -217,7 +435,18 @@ class sm_mp_manager(mp.Process):
                 self._get_observed_surfaces()
             elif (message == sm_mp_manager.IPC_CAST_RAYS):
                 self._cast_rays()
-
+            elif (message == sm_mp_manager.IPC_SET_RAY_GRID):
+                self._set_ray_grid()
+            elif (message == sm_mp_manager.IPC_CAST_RAY_GRID):
+                self._cast_ray_grid()
+            elif (message == sm_mp_manager.IPC_SET_VIEW):
+                self._set_view()
+            elif (message == sm_mp_manager.IPC_SET_LOD):
+                self._set_lod()
+            elif (message == sm_mp_manager.IPC_SET_BUDGET):
+                self._set_budget()
+
+        self._detach_depth()
         self._ipc.close()
 
 
@@ -1,5 +1,8 @@
 
 import multiprocessing as mp
+import concurrent.futures
+import threading
+import queue
 import io
 import fractions
 import tarfile
@@ -160,10 +163,11 @@ class _SI_Hand:
 
 def si_unpack_hand(hand):
     poses = [hand.get_joint_pose(joint) for joint in range(0, hl2ss.SI_HandJointKind.TOTAL)]
-    orientations = np.array([pose.orientation for pose in poses])
-    positions = np.array([pose.position for pose in poses])
-    radii = np.array([pose.radius for pose in poses])
-    accuracies = np.array([pose.accuracy for pose in poses])
+    joints = hand.get_array()
+    orientations = joints['orientation'].copy()
+    positions = joints['position'].copy()
+    radii = joints['radius'].reshape((-1, 1)).copy()
+    accuracies = joints['accuracy'].reshape((-1, 1)).copy()
     return _SI_Hand(poses, orientations, positions, radii, accuracies)
 
 
@@ -503,11 +507,34 @@ def _create_csv_row(port, data):
         return _create_csv_row_for_extended_audio(data)
 
 
-def unpack_to_csv(input_filename, output_filename):    
+class _unpack_progress:
+    def __init__(self, progress, total):
+        self._progress = progress
+        self._total = total
+        self._step = max(total // 100, 1)
+        self._count = 0
+        self._report()
+
+    def _report(self):
+        if (self._progress is not None):
+            self._progress(self._count, self._total)
+
+    def increment(self):
+        self._count += 1
+        if (((self._count % self._step) == 0) or (self._count >= self._total)):
+            self._report()
+
+    def complete(self):
+        self._count = self._total
+        self._report()
+
+
+def unpack_to_csv(input_filename, output_filename, progress=None):    
     rd = hl2ss_io.create_rd(input_filename, hl2ss.ChunkSize.SINGLE_TRANSFER, None)
     rd.open()
 
     port = rd.port
+    counter = _unpack_progress(progress, rd.get_frame_count())
 
     wr = open(output_filename, 'w', newline='')
     csv_wr = csv.writer(wr)
@@ -518,6 +545,7 @@ def unpack_to_csv(input_filename, output_filename):
         if (data is None):
             break
         csv_wr.writerow(_create_csv_row(port, data))
+        counter.increment()
 
     wr.close()
     rd.close()
@@ -561,32 +589,28 @@ def get_av_framerate(port):
         return hl2ss.Parameters_MICROPHONE.SAMPLE_RATE
 
 
-def unpack_to_mp4(input_filenames, output_filename):
-    time_base = fractions.Fraction(1, hl2ss.TimeBase.HUNDREDS_OF_NANOSECONDS)
-
-    readers = [hl2ss_io.create_rd(input_filename, hl2ss.ChunkSize.SINGLE_TRANSFER, None) for input_filename in input_filenames]
-    [reader.open() for reader in readers]
-
-    container = av.open(output_filename, mode='w')
-    streams = [container.add_stream(get_av_codec_name(reader.port, reader.profile_ab if (reader.port == hl2ss.StreamPort.RM_DEPTH_AHAT) else reader.profile), rate=get_av_framerate(reader.port) if (get_av_framerate(reader.port) is not None) else reader.framerate) for reader in readers]
-    codecs = [av.CodecContext.create(get_av_codec_name(reader.port, reader.profile_ab if (reader.port == hl2ss.StreamPort.RM_DEPTH_AHAT) else reader.profile), "r") for reader in readers]
-
-    for stream in streams:
-        stream.time_base = time_base
-    for codec in codecs:
-        codec.time_base = time_base
+def _get_base_timestamp(readers):
+    base = 0
+    for reader in readers:
+        index = reader.get_index()
+        if ((len(index) > 0) and (int(index[0]['timestamp']) > base)):
+            base = int(index[0]['timestamp'])
+    return base
 
-    base = 0#hl2ss._RANGEOF.U64_MAX
 
-    for reader in readers:
-        data = reader.get_next_packet()
-        if ((data is not None) and (data.timestamp > base)):
-            base = data.timestamp
+def _unpack_to_mp4_put(buffer, stop, item):
+    while (not stop.is_set()):
+        try:
+            buffer.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
 
-    [reader.close() for reader in readers]
-    [reader.open() for reader in readers]
 
-    for reader, codec, stream in zip(readers, codecs, streams):
+def _unpack_to_mp4_parse(reader, codec, stream_index, base, buffer, stop):
+    error = None
+    try:
         while (True):
             data = reader.get_next_packet()
             if (data is None):
@@ -598,24 +622,69 @@ def unpack_to_mp4(input_filenames, output_filename):
                 payload = data.payload
 
             local_timestamp = data.timestamp - base
-            if (local_timestamp < 0):
-                continue
+            if (not _unpack_to_mp4_put(buffer, stop, (stream_index, codec.parse(payload) if (local_timestamp >= 0) else [], local_timestamp))):
+                break
+    except Exception as e:
+        error = e
+    finally:
+        # End of stream marker, carries the parser exception if any
+        _unpack_to_mp4_put(buffer, stop, (stream_index, None, error))
+
+
+def unpack_to_mp4(input_filenames, output_filename, progress=None):
+    time_base = fractions.Fraction(1, hl2ss.TimeBase.HUNDREDS_OF_NANOSECONDS)
+
+    readers = [hl2ss_io.create_rd(input_filename, hl2ss.ChunkSize.SINGLE_TRANSFER, None) for input_filename in input_filenames]
+    [reader.open() for reader in readers]
+
+    container = av.open(output_filename, mode='w')
+    streams = [container.add_stream(get_av_codec_name(reader.port, reader.profile_ab if (reader.port == hl2ss.StreamPort.RM_DEPTH_AHAT) else reader.profile), rate=get_av_framerate(reader.port) if (get_av_framerate(reader.port) is not None) else reader.framerate) for reader in readers]
+    codecs = [av.CodecContext.create(get_av_codec_name(reader.port, reader.profile_ab if (reader.port == hl2ss.StreamPort.RM_DEPTH_AHAT) else reader.profile), "r") for reader in readers]
+
+    for stream in streams:
+        stream.time_base = time_base
+    for codec in codecs:
+        codec.time_base = time_base
 
-            for packet in codec.parse(payload):
-                packet.stream = stream
+    base = _get_base_timestamp(readers)
+    counter = _unpack_progress(progress, sum([reader.get_frame_count() for reader in readers]))
+
+    buffer = queue.Queue(maxsize=64 * len(readers))
+    stop = threading.Event()
+    threads = [threading.Thread(target=_unpack_to_mp4_parse, args=(reader, codec, stream_index, base, buffer, stop)) for stream_index, (reader, codec) in enumerate(zip(readers, codecs))]
+    [thread.start() for thread in threads]
+
+    try:
+        active = len(threads)
+        while (active > 0):
+            stream_index, packets, local_timestamp = buffer.get()
+            if (packets is None):
+                # End of stream marker, the last field is the parser exception
+                if (local_timestamp is not None):
+                    raise local_timestamp
+                active -= 1
+                continue
+            for packet in packets:
+                packet.stream = streams[stream_index]
                 packet.pts = local_timestamp
                 packet.dts = local_timestamp
                 packet.time_base = time_base
                 container.mux(packet)
-
-    container.close()
-    [reader.close() for reader in readers]
+            counter.increment()
+    finally:
+        # Unblock the parsers if muxing failed
+        stop.set()
+        [thread.join() for thread in threads]
+        container.close()
+        [reader.close() for reader in readers]
 
 
-def unpack_to_png(input_filename, output_filename):
+def unpack_to_png(input_filename, output_filename, progress=None):
     rd = hl2ss_io.create_rd(input_filename, hl2ss.ChunkSize.SINGLE_TRANSFER, True)
     rd.open()
 
+    counter = _unpack_progress(progress, rd.get_frame_count())
+
     tar = tarfile.open(output_filename, 'w')
     idx = 0
 
@@ -632,11 +701,174 @@ def unpack_to_png(input_filename, output_filename):
         tar.addfile(depth_info, io.BytesIO(depth))
         tar.addfile(ab_info, io.BytesIO(ab))
         idx += 1
+        counter.increment()
 
     tar.close()
     rd.close()
 
 
+#------------------------------------------------------------------------------
+# Columnar Unpacking
+#------------------------------------------------------------------------------
+
+def _get_records(rd, dtype):
+    records = rd.get_payload_array(dtype)
+    return records[:, 0] if (records is not None) else np.frombuffer(rd.get_payloads(), dtype=dtype)
+
+
+def _create_columns_for_rm_imu(rd, columns):
+    dtype = hl2ss._RM_IMU_SAMPLE_DTYPE
+    count = rd.get_payload_sizes() // dtype.itemsize
+    samples = rd.get_payload_array(dtype)
+    if (samples is None):
+        batch = int(count.max()) if (len(count) > 0) else rm_imu_get_batch_size(rd.port)
+        samples = np.zeros((len(count), batch), dtype=dtype)
+        samples[np.arange(batch).reshape((1, -1)) < count.reshape((-1, 1))] = np.frombuffer(rd.get_payloads(), dtype=dtype)
+    columns['sample_count'] = count.astype(np.uint32)
+    for name in dtype.names:
+        columns[name] = samples[name]
+
+
+def _create_columns_for_pv(rd, columns):
+    intrinsics = rd.get_payload_tails(16).view(np.float32)
+    columns['focal_length'] = intrinsics[:, 0:2]
+    columns['principal_point'] = intrinsics[:, 2:4]
+
+
+def _create_columns_for_si(rd, columns):
+    records = _get_records(rd, hl2ss._SI_DTYPE)
+    valid = records['valid']
+    columns['head_pose_valid'] = (valid & hl2ss._SI_Field.HEAD) != 0
+    columns['eye_ray_valid'] = (valid & hl2ss._SI_Field.EYE) != 0
+    columns['hand_left_valid'] = (valid & hl2ss._SI_Field.LEFT) != 0
+    columns['hand_right_valid'] = (valid & hl2ss._SI_Field.RIGHT) != 0
+    for name in ['head_position', 'head_forward', 'head_up', 'eye_origin', 'eye_direction']:
+        columns[name] = records[name]
+    for hand in ['hand_left', 'hand_right']:
+        for name in hl2ss._SI_HAND_JOINT_DTYPE.names:
+            columns[f'{hand}_{name}'] = records[hand][name]
+
+
+def _create_columns_for_eet(rd, columns):
+    records = _get_records(rd, hl2ss._EET_DTYPE)
+    valid = records['valid']
+    for bit, name in enumerate(['calibration', 'combined_ray', 'left_ray', 'right_ray', 'left_openness', 'right_openness', 'vergence_distance']):
+        columns[f'{name}_valid'] = (valid & (1 << bit)) != 0
+    for name in hl2ss._EET_DTYPE.names[1:-1]:
+        columns[name] = records[name]
+
+
+def _create_columns_for_payload(rd, columns):
+    port = rd.port
+    if (port == hl2ss.StreamPort.RM_IMU_ACCELEROMETER):
+        _create_columns_for_rm_imu(rd, columns)
+    elif (port == hl2ss.StreamPort.RM_IMU_GYROSCOPE):
+        _create_columns_for_rm_imu(rd, columns)
+    elif (port == hl2ss.StreamPort.RM_IMU_MAGNETOMETER):
+        _create_columns_for_rm_imu(rd, columns)
+    elif (port == hl2ss.StreamPort.PERSONAL_VIDEO):
+        _create_columns_for_pv(rd, columns)
+    elif (port == hl2ss.StreamPort.SPATIAL_INPUT):
+        _create_columns_for_si(rd, columns)
+    elif (port == hl2ss.StreamPort.EXTENDED_EYE_TRACKER):
+        _create_columns_for_eet(rd, columns)
+
+
+def unpack_to_columns(input_filename):
+    rd = hl2ss_io.create_rd(input_filename, hl2ss.ChunkSize.SINGLE_TRANSFER, None)
+    rd.open()
+
+    columns = {'timestamp' : rd.get_index()['timestamp'].copy()}
+    _create_columns_for_payload(rd, columns)
+    pose = rd.get_poses()
+    if (pose is not None):
+        columns['pose'] = pose
+
+    rd.close()
+    return columns
+
+
+def unpack_to_npz(input_filename, output_filename, progress=None):
+    counter = _unpack_progress(progress, 1)
+    np.savez(output_filename, **unpack_to_columns(input_filename))
+    counter.complete()
+
+
+def _create_parquet_column(pa, column):
+    array = pa.array(column.reshape(-1))
+    for size in reversed(column.shape[1:]):
+        array = pa.FixedSizeListArray.from_arrays(array, size)
+    return array
+
+
+def unpack_to_parquet(input_filename, output_filename, progress=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    counter = _unpack_progress(progress, 1)
+    columns = unpack_to_columns(input_filename)
+    pq.write_table(pa.table({name : _create_parquet_column(pa, column) for name, column in columns.items()}), output_filename)
+    counter.complete()
+
+
+#------------------------------------------------------------------------------
+# Export
+#------------------------------------------------------------------------------
+
+class UnpackFormat:
+    MP4     = 0
+    CSV     = 1
+    PNG     = 2
+    NPZ     = 3
+    PARQUET = 4
+
+
+def _unpack_task_progress(status, output_filename):
+    return lambda count, total : status.put((output_filename, count, total))
+
+
+def _unpack_task(format, input_filenames, output_filename, status):
+    progress = _unpack_task_progress(status, output_filename) if (status is not None) else None
+    if (format == UnpackFormat.MP4):
+        unpack_to_mp4(input_filenames, output_filename, progress)
+    elif (format == UnpackFormat.CSV):
+        unpack_to_csv(input_filenames, output_filename, progress)
+    elif (format == UnpackFormat.PNG):
+        unpack_to_png(input_filenames, output_filename, progress)
+    elif (format == UnpackFormat.NPZ):
+        unpack_to_npz(input_filenames, output_filename, progress)
+    elif (format == UnpackFormat.PARQUET):
+        unpack_to_parquet(input_filenames, output_filename, progress)
+    return output_filename
+
+
+def _unpack_drain(status, progress):
+    while (True):
+        try:
+            output_filename, count, total = status.get_nowait()
+        except queue.Empty:
+            break
+        progress(output_filename, count, total)
+
+
+def unpack_many(tasks, max_workers=None, progress=None):
+    manager = mp.Manager() if (progress is not None) else None
+    status = manager.Queue() if (manager is not None) else None
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        pending = {executor.submit(_unpack_task, format, input_filenames, output_filename, status) for format, input_filenames, output_filename in tasks}
+        while (len(pending) > 0):
+            done, pending = concurrent.futures.wait(pending, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED)
+            if (progress is not None):
+                _unpack_drain(status, progress)
+            for future in done:
+                future.result()
+
+    if (manager is not None):
+        _unpack_drain(status, progress)
+        manager.shutdown()
+
+
 #------------------------------------------------------------------------------
 # Timing
 #------------------------------------------------------------------------------
@@ -9,7 +9,6 @@ from pynput import keyboard
 import numpy as np
 import multiprocessing as mp
 import open3d as o3d
-import cv2
 import hl2ss
 import hl2ss_lnm
 import hl2ss_mp
@@ -73,6 +72,8 @@ if __name__ == '__main__':
 
     uv2xy = hl2ss_3dcv.compute_uv2xy(calibration_lt.intrinsics, hl2ss.Parameters_RM_DEPTH_LONGTHROW.WIDTH, hl2ss.Parameters_RM_DEPTH_LONGTHROW.HEIGHT)
     xy1, scale = hl2ss_3dcv.rm_depth_compute_rays(uv2xy, calibration_lt.scale)
+    normalizer = hl2ss_3dcv.rm_depth_undistort_normalizer(calibration_lt.undistort_map, scale)
+    registration = hl2ss_3dcv.rm_depth_pv_registration(xy1, calibration_lt.extrinsics, pv_width, pv_height)
 
     # Create Open3D integrator and visualizer ---------------------------------
     volume = o3d.pipelines.integration.ScalableTSDFVolume(voxel_length=voxel_length, sdf_trunc=sdf_trunc, color_type=o3d.pipelines.integration.TSDFVolumeColorType.RGB8)
@@ -118,8 +119,7 @@ if __name__ == '__main__':
             continue
 
         # Preprocess frames ---------------------------------------------------
-        depth = hl2ss_3dcv.rm_depth_undistort(data_lt.payload.depth, calibration_lt.undistort_map)
-        depth = hl2ss_3dcv.rm_depth_normalize(depth, scale)
+        depth = normalizer.undistort(data_lt.payload.depth)
         color = data_pv.payload.image
 
         # Update PV intrinsics ------------------------------------------------
@@ -128,16 +128,9 @@ if __name__ == '__main__':
         color_intrinsics, color_extrinsics = hl2ss_3dcv.pv_fix_calibration(pv_intrinsics, pv_extrinsics)
         
         # Generate aligned RGBD image -----------------------------------------
-        lt_points         = hl2ss_3dcv.rm_depth_to_points(xy1, depth)
-        lt_to_world       = hl2ss_3dcv.camera_to_rignode(calibration_lt.extrinsics) @ hl2ss_3dcv.reference_to_world(data_lt.pose)
-        world_to_lt       = hl2ss_3dcv.world_to_reference(data_lt.pose) @ hl2ss_3dcv.rignode_to_camera(calibration_lt.extrinsics)
-        world_to_pv_image = hl2ss_3dcv.world_to_reference(data_pv.pose) @ hl2ss_3dcv.rignode_to_camera(color_extrinsics) @ hl2ss_3dcv.camera_to_image(color_intrinsics)
-        world_points      = hl2ss_3dcv.transform(lt_points, lt_to_world)
-        pv_uv             = hl2ss_3dcv.project(world_points, world_to_pv_image)
-        color             = cv2.remap(color, pv_uv[:, :, 0], pv_uv[:, :, 1], cv2.INTER_LINEAR)
-
-        mask_uv = hl2ss_3dcv.slice_to_block((pv_uv[:, :, 0] < 0) | (pv_uv[:, :, 0] >= pv_width) | (pv_uv[:, :, 1] < 0) | (pv_uv[:, :, 1] >= pv_height))
-        depth[mask_uv] = 0
+        depth = registration.update(depth, data_lt.pose, color_intrinsics, color_extrinsics, data_pv.pose, depth)
+        color = registration.color_to_depth(color)
+        world_to_lt = registration.get_world_to_depth()
 
         # Convert to Open3D RGBD image ----------------------------------------
         color_image = o3d.geometry.Image(color)
@@ -72,6 +72,10 @@ if __name__ == "__main__":
     pv_xy1 = hl2ss_3dcv.to_homogeneous(pv_uv2xy)
     pv_rays = hl2ss_3dcv.to_unit(pv_xy1)
 
+    # Send PV rays to the SM manager once, world rays are computed per frame
+    # from the camera pose
+    sm_manager.set_ray_grid(pv_rays)
+
     # Create windows
     wnd_name_pv = 'PV'
     wnd_name_depth = 'PV-SM Depth'
@@ -107,16 +111,12 @@ if __name__ == "__main__":
 
         camera2world = hl2ss_3dcv.camera_to_rignode(pv_calibration.extrinsics) @ hl2ss_3dcv.reference_to_world(data.pose)
 
-        # Compute PV camera rays in world coordinates
-        pv_world_origins = np.tile(camera2world[3, :3], (pv_height, pv_width, 1))
-        pv_world_directions = pv_rays @ camera2world[:3, :3]
-        pv_world_rays = np.dstack((pv_world_origins, pv_world_directions))
-
-        # Update SM surfaces
+        # Update SM surfaces, prioritizing those in view of the PV camera
+        sm_manager.set_view(hl2ss_3dcv.sm_compute_frustum(pv_calibration.intrinsics, camera2world, pv_width, pv_height, 0.1, sm_radius), camera2world[3, :3])
         sm_manager.get_observed_surfaces()
 
         # Obtain PV depth via raycasting
-        pv_depth = sm_manager.cast_rays(pv_world_rays)
+        pv_depth = sm_manager.cast_ray_grid(camera2world)
         pv_depth[np.isinf(pv_depth)] = 0
 
         # Display images
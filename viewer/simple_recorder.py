@@ -164,16 +164,43 @@ if __name__ == '__main__':
     mp4_input_filenames = [filenames[port] for port in ports_to_mp4 if (port in ports)]
     mp4_output_filename = os.path.join(path, 'video.mp4')
 
+    tasks = []
+
     if (len(mp4_input_filenames) > 0):
-        hl2ss_utilities.unpack_to_mp4(mp4_input_filenames, mp4_output_filename)
+        tasks.append((hl2ss_utilities.UnpackFormat.MP4, mp4_input_filenames, mp4_output_filename))
 
     # Unpack RM Depth Long Throw to a tar file containing Depth and AB PNGs ---
     if (hl2ss.StreamPort.RM_DEPTH_LONGTHROW in ports):
-        hl2ss_utilities.unpack_to_png(filenames[hl2ss.StreamPort.RM_DEPTH_LONGTHROW], os.path.join(path, 'long_throw.tar'))
+        tasks.append((hl2ss_utilities.UnpackFormat.PNG, filenames[hl2ss.StreamPort.RM_DEPTH_LONGTHROW], os.path.join(path, 'long_throw.tar')))
 
     # Unpack stream metadata and numeric payloads to csv ----------------------
     for port in ports:
         input_filename = filenames[port]
         output_filename = input_filename[:input_filename.rfind('.bin')] + '.csv'
-        hl2ss_utilities.unpack_to_csv(input_filename, output_filename)
+        tasks.append((hl2ss_utilities.UnpackFormat.CSV, input_filename, output_filename))
+
+    # Unpack numeric streams to npz arrays ------------------------------------
+    ports_to_npz = [
+        hl2ss.StreamPort.RM_IMU_ACCELEROMETER,
+        hl2ss.StreamPort.RM_IMU_GYROSCOPE,
+        hl2ss.StreamPort.RM_IMU_MAGNETOMETER,
+        hl2ss.StreamPort.SPATIAL_INPUT,
+        hl2ss.StreamPort.EXTENDED_EYE_TRACKER,
+    ]
+
+    for port in ports_to_npz:
+        if (port in ports):
+            input_filename = filenames[port]
+            output_filename = input_filename[:input_filename.rfind('.bin')] + '.npz'
+            tasks.append((hl2ss_utilities.UnpackFormat.NPZ, input_filename, output_filename))
+
+    # Run all unpack tasks concurrently in a process pool ---------------------
+    # Print each file once, when it is complete
+    unpacked = set()
+
+    def on_progress(output_filename, count, total):
+        if ((count >= total) and (output_filename not in unpacked)):
+            unpacked.add(output_filename)
+            print(f'{os.path.basename(output_filename)}: done')
 
+    hl2ss_utilities.unpack_many(tasks, None, on_progress)